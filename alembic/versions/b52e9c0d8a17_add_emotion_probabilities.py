@@ -0,0 +1,28 @@
+"""add emotion probabilities
+
+Revision ID: b52e9c0d8a17
+Revises: 7f3c2a91d4e5
+Create Date: 2026-10-17 14:03:27.550912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52e9c0d8a17'
+down_revision: Union[str, None] = '7f3c2a91d4e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('emotion_data', sa.Column('probabilities', sa.LargeBinary(), nullable=True))
+    op.add_column('emotion_trends', sa.Column('mean_probabilities', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('emotion_trends', 'mean_probabilities')
+    op.drop_column('emotion_data', 'probabilities')
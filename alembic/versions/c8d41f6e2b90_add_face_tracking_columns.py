@@ -0,0 +1,28 @@
+"""add face tracking columns
+
+Revision ID: c8d41f6e2b90
+Revises: b52e9c0d8a17
+Create Date: 2026-10-17 16:41:09.207315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8d41f6e2b90'
+down_revision: Union[str, None] = 'b52e9c0d8a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('emotion_data', sa.Column('face_id', sa.Integer(), nullable=True))
+    op.add_column('emotion_trends', sa.Column('face_summaries', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('emotion_trends', 'face_summaries')
+    op.drop_column('emotion_data', 'face_id')
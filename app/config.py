@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -20,6 +21,69 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
 
+    API_ONLY: bool = False  # serve the REST routers without /ws/video and never load the emotion model
+
+    # Inference
+    INFERENCE_EXECUTOR: str = "thread"  # "thread" or "process"
+    INFERENCE_WORKERS: int = 2
+    INFERENCE_PIPELINE: str = "crop"  # "crop" reuses Haar boxes, "deepface" lets DeepFace detect again
+    INFERENCE_BATCHING: bool = True
+    INFERENCE_MAX_BATCH_SIZE: int = 16
+    INFERENCE_MAX_BATCH_WAIT_MS: float = 10.0
+    EMOTION_RUNTIME: str = "keras"  # "keras", "onnx", "tflite" or "stub" (load tests only); see scripts/export_emotion_model.py
+    EMOTION_MODEL_PATH: Optional[str] = "models/emotion.onnx"
+    EMOTION_RUNTIME_THREADS: int = 1
+    INFERENCE_BACKEND: str = "local"  # "local" runs the model in this process, "redis" sends crops to app.inference_worker
+    INFERENCE_REDIS_URL: str = "redis://localhost:6379/0"
+    INFERENCE_REMOTE_TIMEOUT: float = 2.0
+    INFERENCE_REMOTE_MAX_QUEUE: int = 10000
+
+    # Face detection, see app/services/face_detectors.py for the model files
+    FACE_DETECTOR: str = "haar"  # "haar", "lbp", "dnn" or "yunet"
+    FACE_DETECTOR_MODEL: Optional[str] = None
+    FACE_DETECTOR_CONFIG: Optional[str] = None
+    FACE_DETECTOR_CONFIDENCE: float = 0.6
+
+    # Video sessions
+    VIDEO_MAX_FPS: int = 10
+    VIDEO_MIN_FPS: int = 1
+    VIDEO_TARGET_LATENCY_MS: float = 250.0
+    VIDEO_MAX_PENDING_INFERENCES: int = 32
+    VIDEO_CHANGE_THRESHOLD: float = 3.0  # mean abs grayscale difference, 0 disables reuse
+    VIDEO_CHANGE_MAX_SKIPS: int = 10
+    VIDEO_DECODE_MIN_SIDE: int = 240  # decode JPEGs at 1/2, 1/4 or 1/8 scale while the short side stays above this
+    VIDEO_ROI_DETECTION: bool = True  # search around the last face box instead of the whole frame
+    VIDEO_ROI_FULL_SCAN_EVERY: int = 10
+    VIDEO_MULTI_FACE: bool = False  # track and classify every face instead of only the largest
+    VIDEO_MAX_FACES: int = 4
+    VIDEO_DETECT_EVERY: int = 5  # multi-face mode re-runs the detector every N frames and tracks in between
+    VIDEO_SESSION_STORE: str = "memory"  # "memory" or "redis"
+    VIDEO_SESSION_GRACE_PERIOD: float = 30.0  # seconds a dropped session can be resumed, 0 finalizes immediately
+    VIDEO_SESSION_REAP_INTERVAL: float = 5.0
+    VIDEO_SMOOTHING: bool = False  # EMA + hysteresis per face; only send and store changes and heartbeats (?smoothing= overrides)
+    VIDEO_SMOOTHING_TIME_CONSTANT: float = 0.5  # seconds of EMA memory
+    VIDEO_SMOOTHING_MARGIN: float = 10.0  # percentage points a new emotion must lead by to take over
+    VIDEO_SMOOTHING_MIN_HOLD: float = 0.5  # seconds an emotion (or a lost face) is held before the state changes
+    VIDEO_HEARTBEAT_INTERVAL: float = 2.0  # resend and store the current state at least this often, 0 disables
+    WS_AUTH_CACHE_TTL: float = 30.0
+    WS_AUTH_CACHE_MAX_SIZE: int = 10000
+
+    # Emotion sample write-behind buffer
+    EMOTION_WRITE_FLUSH_SIZE: int = 500
+    EMOTION_WRITE_FLUSH_INTERVAL: float = 2.0
+    EMOTION_WRITE_MAX_PENDING: int = 10000
+    EMOTION_WRITE_MAX_ATTEMPTS: int = 3  # whole-batch tries before a batch with bad rows is split and they are dropped
+    EMOTION_WRITE_MAX_BACKOFF: float = 60.0  # longest pause between writes while the database is unreachable
+    STORE_EMOTION_PROBABILITIES: bool = False  # keep the full 7-way distribution per sample as packed float16
+
+    # Background jobs
+    JOB_WORKERS: int = 2
+    JOB_POLL_INTERVAL: float = 5.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_STALE_AFTER: float = 600.0
+    JOB_SWEEP_INTERVAL: float = 60.0  # how often workers look for stale RUNNING jobs
+    JOB_SHUTDOWN_TIMEOUT: float = 30.0  # how long shutdown waits for running jobs
+
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,9 +1,11 @@
 import os
-from sqlalchemy import create_engine
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
-from sqlalchemy.pool import QueuePool
+from app.services import metrics
 import redis
 
 redis_client = redis.StrictRedis(host="localhost", port=6379, db=0, decode_responses=True)
@@ -13,14 +15,39 @@ DATABASE_URL = f"postgresql://{settings.DATABASE_USERNAME}:{settings.DATABASE_PA
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set in environment variables!")
 
+pool_wait_histogram = metrics.histogram(
+    "db_pool_wait_seconds", "Time session_scope() waits for a pooled database connection"
+)
+pool_checked_out_gauge = metrics.gauge(
+    "db_pool_checked_out", "Database connections currently checked out of the pool"
+)
+pool_connections_counter = metrics.counter(
+    "db_pool_connections_opened_total", "New database connections opened by the pool"
+)
+
 engine = create_engine(
     DATABASE_URL,
-    poolclass=QueuePool,  
     pool_size=20,         
     max_overflow=0,    
     echo=False  
 )
 
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_checked_out_gauge.inc()
+
+def _on_checkin(dbapi_connection, connection_record):
+    pool_checked_out_gauge.dec()
+
+def _on_connect(dbapi_connection, connection_record):
+    pool_connections_counter.inc()
+
+def instrument_engine(engine):
+    event.listen(engine, "checkout", _on_checkout)
+    event.listen(engine, "checkin", _on_checkin)
+    event.listen(engine, "connect", _on_connect)
+
+instrument_engine(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -32,5 +59,20 @@ def get_db():
     finally:
         db.close()
 
+@contextmanager
+def session_scope():
+    # For code outside a request (WebSockets, background tasks): hold a
+    # pooled connection only for the unit of work, not the whole socket.
+    db = SessionLocal()
+    try:
+        # Check the connection out up front so the wait for the pool is
+        # measured on its own.
+        started = time.perf_counter()
+        db.connection()
+        pool_wait_histogram.observe(time.perf_counter() - started)
+        yield db
+    finally:
+        db.close()
+
 def shutdown_database():
     engine.dispose()
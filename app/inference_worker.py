@@ -0,0 +1,139 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import numpy as np
+import redis
+from app.config import settings
+from app.services.emotion_model import EMOTION_INPUT_SIZE, predict_emotions
+from app.services.inference import warm_up_worker
+from app.services.remote_inference import REQUEST_STREAM, WORKER_GROUP, decode_face
+
+# Shared inference tier: run with
+#   python -m app.inference_worker --processes 4
+# next to API processes started with INFERENCE_BACKEND=redis. Every process
+# holds one model and pulls batches of face crops from the request stream.
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("emotion-inference-worker")
+logger.setLevel(logging.INFO)
+
+REPLY_TTL = 60
+CLAIM_INTERVAL = 30.0
+
+def ensure_group(client: redis.Redis):
+    try:
+        client.xgroup_create(REQUEST_STREAM, WORKER_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+def reply(client: redis.Redis, replies: list):
+    pipe = client.pipeline(transaction=False)
+    for reply_to, message in replies:
+        pipe.lpush(reply_to, json.dumps(message))
+        pipe.expire(reply_to, REPLY_TTL)
+    pipe.execute()
+
+def process_entries(client: redis.Redis, entries: list, timeout: float):
+    now_ms = time.time() * 1000
+    ids, faces, requests, replies = [], [], [], []
+
+    for entry_id, fields in entries:
+        ids.append(entry_id)
+        if not fields:
+            # Trimmed from the stream before it was read.
+            continue
+
+        # Stream ids start with the enqueue time in ms; skip crops whose
+        # socket has already given up waiting.
+        if now_ms - int(entry_id.split(b"-")[0]) > timeout * 1000:
+            continue
+
+        request_id = fields[b"id"].decode()
+        reply_to = fields[b"reply_to"].decode()
+        try:
+            faces.append(decode_face(fields[b"face"], EMOTION_INPUT_SIZE))
+            requests.append((request_id, reply_to))
+        except Exception as e:
+            replies.append((reply_to, {"id": request_id, "error": f"Invalid face crop: {str(e)}"}))
+
+    if faces:
+        try:
+            probabilities = predict_emotions(np.stack(faces))
+            for (request_id, reply_to), result in zip(requests, probabilities):
+                replies.append((reply_to, {"id": request_id, "probabilities": [float(p) for p in result]}))
+        except Exception as e:
+            logger.error(f"Batched inference failed: {str(e)}")
+            for request_id, reply_to in requests:
+                replies.append((reply_to, {"id": request_id, "error": str(e)}))
+
+    if replies:
+        reply(client, replies)
+
+    if ids:
+        client.xack(REQUEST_STREAM, WORKER_GROUP, *ids)
+        client.xdel(REQUEST_STREAM, *ids)
+
+    return len(faces)
+
+def run_worker(index: int):
+    client = redis.Redis.from_url(settings.INFERENCE_REDIS_URL)
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    batch_size = max(1, settings.INFERENCE_MAX_BATCH_SIZE)
+    timeout = settings.INFERENCE_REMOTE_TIMEOUT
+
+    ensure_group(client)
+    logger.info(f"Worker {index} ({consumer}) warmed up in {warm_up_worker():.2f}s")
+
+    last_claim = 0.0
+    while True:
+        try:
+            if time.monotonic() - last_claim > CLAIM_INTERVAL:
+                # Take over crops a crashed worker read but never answered.
+                last_claim = time.monotonic()
+                # Redis 7 replies [cursor, entries, deleted ids], 6.2 only
+                # [cursor, entries].
+                reply = client.xautoclaim(
+                    REQUEST_STREAM, WORKER_GROUP, consumer,
+                    min_idle_time=int(CLAIM_INTERVAL * 1000), count=batch_size
+                )
+                claimed = reply[1]
+                if claimed:
+                    process_entries(client, claimed, timeout)
+
+            # Returns as soon as anything is queued, with up to batch_size
+            # crops, so batches fill up by themselves under load.
+            streams = client.xreadgroup(
+                WORKER_GROUP, consumer, {REQUEST_STREAM: ">"},
+                count=batch_size, block=1000
+            )
+            for _, entries in streams:
+                process_entries(client, entries, timeout)
+
+        except redis.ConnectionError as e:
+            logger.error(f"Lost connection to Redis: {str(e)}")
+            time.sleep(1.0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Emotion inference worker pool")
+    parser.add_argument("--processes", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker(0)
+        return
+
+    # TensorFlow is not fork-safe, so workers are spawned fresh.
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_worker, args=(index,)) for index in range(args.processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,53 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import users, video_ws, admin, reports, auth, notification, logs, feedback, emotion, two_factor
-from app.database import engine, Base
-from app.routes.video_ws import router as websocket_router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.config import settings
+from app.routes import users, admin, reports, auth, notification, logs, feedback, emotion, two_factor
+from app.database import engine, Base, shutdown_database
+from app.services.job_queue import job_queue
+from app.services import metrics
+
+# API_ONLY processes serve the REST routers and background jobs only. The
+# video router and everything behind it (inference executors, the emotion
+# model, the write-behind buffer, session tracking) is imported lazily so
+# these processes never load the ML stack.
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.API_ONLY:
+        await job_queue.start()
+        yield
+        await job_queue.stop()
+        shutdown_database()
+        return
+
+    from app.services.model_registry import model_registry
+    from app.services.inference import shutdown_inference
+    from app.services.emotion_writer import emotion_writer
+    from app.services.session_registry import session_registry
+
+    # Warm up in the background so the process can answer /ping (not ready)
+    # while the emotion model is being built.
+    warmup_task = asyncio.create_task(model_registry.load())
+    emotion_writer.start()
+    await job_queue.start()
+    session_registry.start()
+    yield
+    warmup_task.cancel()
+    await session_registry.stop()
+    await emotion_writer.stop()
+    await job_queue.stop()
+    await shutdown_inference()
+    shutdown_database()
 
 app = FastAPI(
     title="Emotion Recognition API",
     description="Backend for real-time emotion tracking and analytics",
     version="1.0.0",
     docs_url="/docs",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -38,10 +77,20 @@ app.include_router(emotion.router)
 
 app.include_router(two_factor.router)
 
-app.include_router(websocket_router)
+if not settings.API_ONLY:
+    from app.routes.video_ws import router as websocket_router
+    app.include_router(websocket_router)
 
 @app.head("/ping")
 def ping():
-    return {"status": "ok"}
+    if settings.API_ONLY:
+        return {"status": "ok"}
 
+    from app.services.model_registry import model_registry
+    if not model_registry.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Enum, TIMESTAMP, JSON, ForeignKey, Float, Text, Index
+from sqlalchemy import Column, Integer, String, Boolean, Enum, TIMESTAMP, JSON, ForeignKey, Float, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func  
 from datetime import datetime
@@ -111,6 +111,10 @@ class EmotionData(Base):
     timestamp = Column(TIMESTAMP, server_default=func.now())
     emotion = Column(Enum(EmotionType), nullable=False)
     intensity = Column(Float, nullable=False)
+    # Full classifier output as packed little-endian float16, EMOTION_LABELS order
+    probabilities = Column(LargeBinary, nullable=True)
+    # Track id within the session in multi-face mode
+    face_id = Column(Integer, nullable=True)
 
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -136,6 +140,8 @@ class EmotionTrend(Base):
     period_end = Column(TIMESTAMP, nullable=False)
     emotion_summary = Column(JSON, nullable=False)  
     average_intensity = Column(Float, nullable=False)
+    mean_probabilities = Column(JSON, nullable=True)
+    face_summaries = Column(JSON, nullable=True)
 
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -332,4 +338,32 @@ class Report(Base):
     user = relationship("User", back_populates="reports")
 
     def __repr__(self):
-        return f"<Report {self.id} - {self.report_type} (User {self.user_id})>"
\ No newline at end of file
+        return f"<Report {self.id} - {self.report_type} (User {self.user_id})>"
+
+class JobStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(JobStatus), default=JobStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    started_at = Column(TIMESTAMP, nullable=True)
+    finished_at = Column(TIMESTAMP, nullable=True)
+
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('ix_jobs_status', 'status'),
+    )
+
+    def __repr__(self):
+        return f"<Job {self.id} - {self.job_type} ({self.status})>"
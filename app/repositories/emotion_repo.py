@@ -1,12 +1,13 @@
 from sqlalchemy.orm import Session 
 from sqlalchemy import desc, and_ 
-from sqlalchemy import func
+from sqlalchemy import func, insert
 from datetime import datetime, date
 from app.models import EmotionData, EmotionTrend, EmotionType
 import logging
 from collections import defaultdict
 from app.models import Report, User, ReportType, ExportFormat, Log, LogType, LogAction, User
 from typing import List, Optional
+from app.utils.emotion_vector import pack_probabilities, unpack_probabilities, label_probabilities
 from app.utils.auth import get_current_user, admin_required
 from fastapi import Depends
 from app.database import get_db
@@ -55,6 +56,59 @@ def save_emotion(db: Session, user_id: int, session_id : str, emotion: str, inte
         db.rollback()  
         raise Exception("Error saving emotion data to the database.")
 
+def normalize_emotion(emotion: str) -> Optional[EmotionType]:
+    emotion = emotion.strip().upper()
+    if emotion == "SURPRISE":
+        emotion = "SURPRISED"
+    if emotion not in EmotionType.__members__:
+        logger.error(f"Invalid emotion type: {emotion}")
+        return None
+    return EmotionType[emotion]
+
+def build_emotion_rows(user_id: int, session_id: str, emotions: List[dict]) -> List[dict]:
+    rows = []
+    for record in emotions:
+        emotion = normalize_emotion(record["emotion"])
+        if emotion is None:
+            continue
+
+        probabilities = record.get("probabilities")
+
+        # Every row carries the same keys so they stay in one executemany.
+        rows.append({
+            "user_id": user_id,
+            "session_id": str(session_id),
+            "emotion": emotion,
+            "intensity": float(record["confidence"]),
+            "probabilities": pack_probabilities(probabilities) if probabilities is not None else None,
+            "face_id": record.get("face_id"),
+            "timestamp": record.get("timestamp") or datetime.utcnow(),
+        })
+
+    return rows
+
+def save_emotion_rows(db: Session, rows: List[dict]):
+    if not rows:
+        return 0
+
+    try:
+        # One executemany in one transaction; the driver folds it into
+        # multi-row INSERT statements.
+        db.execute(insert(EmotionData), rows)
+        db.commit()
+
+        logger.info(f"Saved {len(rows)} emotion samples.")
+
+        return len(rows)
+
+    except Exception as e:
+        logger.error(f"Error bulk saving emotion data: {str(e)}")
+        db.rollback()
+        raise Exception("Error saving emotion data to the database.") from e
+
+def save_emotions_bulk(db: Session, user_id: int, session_id: str, emotions: List[dict]):
+    return save_emotion_rows(db, build_emotion_rows(user_id, session_id, emotions))
+
 def save_emotion_trend(db: Session,user_id: int, session_id : str, period_start: datetime, period_end: datetime):
     try:
         emotion_data = db.query(EmotionData).filter(
@@ -88,13 +142,49 @@ def save_emotion_trend(db: Session,user_id: int, session_id : str, period_start:
             "average_confidence": data["average_confidence"],
         } for emotion, data in emotion_summary.items()}
 
+        probability_matrix = unpack_probabilities(entry.probabilities for entry in emotion_data)
+        mean_probabilities = (
+            label_probabilities(probability_matrix.mean(axis=0))
+            if len(probability_matrix) else None
+        )
+
+        return save_emotion_trend_summary(
+            db=db,
+            user_id=user_id,
+            session_id=session_id,
+            period_start=period_start,
+            period_end=period_end,
+            emotion_summary=emotion_summary_dict,
+            average_intensity=average_confidence,
+            mean_probabilities=mean_probabilities
+        )
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f" Error saving emotion trend for user {user_id}: {str(e)}")
+        return None  
+
+def save_emotion_trend_summary(
+    db: Session,
+    user_id: int,
+    session_id: str,
+    period_start: datetime,
+    period_end: datetime,
+    emotion_summary: dict,
+    average_intensity: float,
+    mean_probabilities: Optional[dict] = None,
+    face_summaries: Optional[dict] = None
+):
+    try:
         new_trend = EmotionTrend(
             user_id=user_id,
             period_start=period_start,
             period_end=period_end,
             session_id= str(session_id),
-            emotion_summary=emotion_summary_dict,  
-            average_intensity=average_confidence
+            emotion_summary=emotion_summary,  
+            average_intensity=average_intensity,
+            mean_probabilities=mean_probabilities,
+            face_summaries=face_summaries
         )
 
         db.add(new_trend)
@@ -9,6 +9,7 @@ from app.schemas import UserCreate, UserResponse, LogType
 from app.utils.auth import hash_password, verify_password, get_current_user
 from app.models import NotificationType, Notification, NotificationStatus
 from app.utils.jwt import create_access_token, verify_token
+from app.services.identity_cache import forget_identity
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -134,6 +135,7 @@ def complete_login(user: User, db: Session):
     print(token)
     
     user.last_login = datetime.now(timezone.utc)
+    forget_identity(user.jwt_token)
     user.jwt_token = token
     user.is_verified = True
     user.is_active = True
@@ -183,6 +185,7 @@ def logout(
 
     user = db.query(User).filter(User.id == current_user["user_id"]).first()
     if user:
+        forget_identity(user.jwt_token)
         user.jwt_token = None
         db.commit()
         db.refresh(user)
@@ -1,41 +1,72 @@
 import asyncio
-import uuid
+import time
 import logging
-import cv2
-import numpy as np
-from sqlalchemy.orm import Session
-from fastapi import Depends, WebSocket, WebSocketDisconnect, APIRouter, HTTPException
-from deepface import DeepFace
+from fastapi import WebSocket, WebSocketDisconnect, APIRouter, HTTPException
+from starlette.websockets import WebSocketState
 from datetime import datetime
-from app.services.face_recognition import detect_faces
-from app.repositories.emotion_repo import save_emotion, save_emotion_trend
-from app.database import get_db
-from app.services.report_service import generate_emotion_monitoring_pdf_report
+from typing import Optional
+from app.services.inference import run_inference, run_tracked_inference, pending_inferences
+from app.services.face_tracker import FaceTracker
+from app.services.face_recognition import FaceRoi
+from app.services.frame_control import AdaptiveFrameController, LatestFrameBuffer, receive_frames
+from app.services.change_detector import FrameChangeDetector
+from app.services.frame_decoder import FrameDecoder
+from app.services.frame_protocol import ResultSender, PROTOCOL_JSON, PROTOCOL_BINARY, unpack_frames
+from app.services.stage_timer import StageTimer
+from app.services.emotion_smoother import SessionSmoother
+from app.config import settings
+from app.services.emotion_writer import emotion_writer
+from app.services.session_registry import session_registry
+from app.services.identity_cache import cache_identity, cached_identity
+from app.database import session_scope
+from app.services import metrics
 from app.models import User
-from fastapi import Depends
+from app.utils.jwt import verify_token
 import os
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv('ALGORITHM')
 
 router = APIRouter()
+results_sent_counter = metrics.counter(
+    "video_results_sent_total", "Emotion results sent to video clients"
+)
 logger = logging.getLogger("emotion-websocket")
 logger.setLevel(logging.INFO)
 
 MAX_FRAME_SIZE = 5 * 1024 * 1024 
 MIN_CONFIDENCE = 0.3
-FRAME_PROCESS_INTERVAL = 0.1
-EMOTION_SAVE_INTERVAL = 2.0  
+# Close codes that mean the client ended the session rather than lost it.
+SESSION_END_CODES = (1000, 1005)
 
-async def get_user_from_token(token: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.jwt_token == token).first()
+def _load_user(user_id: int) -> Optional[User]:
+    with session_scope() as db:
+        return db.query(User).filter(User.id == user_id).first()
 
-    id = user.id # type: ignore
+async def get_user_from_token(token: str) -> Optional[int]:
+    cached = cached_identity(token)
+    if cached is not None:
+        return cached
 
-    return id
+    try:
+        payload = verify_token(token)
+    except HTTPException:
+        return None
+
+    user = await asyncio.to_thread(_load_user, payload["user_id"])
+
+    # Logout clears jwt_token, so only the user's current token is accepted
+    # (after a cache hit, see identity_cache for the per-process lag).
+    if not user or user.jwt_token != token:
+        return None
+
+    cache_identity(token, user.id, payload)
+    return user.id
 
 @router.websocket("/ws/video/")
-async def video_websocket(websocket: WebSocket, db: Session = Depends(get_db)):
+async def video_websocket(websocket: WebSocket):
+    # No request-scoped DB session here: it would pin a pooled connection
+    # for the whole life of the socket. Writes go through session_scope().
     await websocket.accept()
 
     token = websocket.query_params.get('token')
@@ -44,32 +75,86 @@ async def video_websocket(websocket: WebSocket, db: Session = Depends(get_db)):
         await websocket.close(code=1008)
         return 
     
-    id = await get_user_from_token(token, db)
+    protocol = websocket.query_params.get('protocol', PROTOCOL_JSON)
+    if protocol not in (PROTOCOL_JSON, PROTOCOL_BINARY):
+        await websocket.close(code=1003)
+        return
+
+    id = await get_user_from_token(token)
+    if id is None:
+        logger.warning("Rejected WebSocket connection with an invalid token")
+        await websocket.close(code=1008)
+        return
 
     logger.info("WebSocket connection accepted")
-    session_id = str(uuid.uuid4())
+    session, resumed = await session_registry.open(id, websocket.query_params.get('session_id'))
+    generation = session.generation
+    session_id = session.session_id
+    session_ended = False
     start_time = datetime.utcnow()
-    last_save_time = start_time
     frame_count = 0
     user_id = id
+    frame_buffer = LatestFrameBuffer()
+    receiver_task = None
+    frame_controller = AdaptiveFrameController(
+        min_fps=settings.VIDEO_MIN_FPS,
+        max_fps=settings.VIDEO_MAX_FPS,
+        target_latency_ms=settings.VIDEO_TARGET_LATENCY_MS,
+        max_pending=settings.VIDEO_MAX_PENDING_INFERENCES
+    )
+    change_detector = FrameChangeDetector(
+        threshold=settings.VIDEO_CHANGE_THRESHOLD,
+        max_skips=settings.VIDEO_CHANGE_MAX_SKIPS
+    )
+    frame_decoder = FrameDecoder(min_side=settings.VIDEO_DECODE_MIN_SIDE)
+    face_tracker = None
+    if settings.VIDEO_MULTI_FACE:
+        face_tracker = FaceTracker(
+            detect_every=settings.VIDEO_DETECT_EVERY,
+            max_faces=settings.VIDEO_MAX_FACES,
+            first_track_id=session.next_track_id
+        )
+    face_roi = FaceRoi(settings.VIDEO_ROI_FULL_SCAN_EVERY) if settings.VIDEO_ROI_DETECTION else None
+    last_analysis = None
+    session_stats = session.stats
+    stage_timer = StageTimer()
+    results_sent = 0
+    smoothing = websocket.query_params.get('smoothing')
+    smoother = None
+    if (settings.VIDEO_SMOOTHING if smoothing is None else smoothing in ('1', 'true')):
+        smoother = SessionSmoother(
+            time_constant=settings.VIDEO_SMOOTHING_TIME_CONSTANT,
+            switch_margin=settings.VIDEO_SMOOTHING_MARGIN,
+            min_hold=settings.VIDEO_SMOOTHING_MIN_HOLD,
+            heartbeat=settings.VIDEO_HEARTBEAT_INTERVAL
+        )
+    result_sender = ResultSender(
+        websocket,
+        protocol=protocol,
+        include_probabilities=websocket.query_params.get('probabilities') in ('1', 'true')
+    )
 
     try:
         await websocket.send_json({
             "status": "connected",
             "session_id": session_id,
-            "message": "Ready to receive frames"
+            "resumed": resumed,
+            "message": "Ready to receive frames",
+            **result_sender.handshake()
         })
 
-        session_emotions = []
-        unsaved_emotions = []
+        receiver_task = asyncio.create_task(receive_frames(
+            websocket,
+            frame_buffer,
+            unpack=unpack_frames if protocol == PROTOCOL_BINARY else None
+        ))
 
         while True:
-            print("Waiting for frame...")
+            logger.debug("Waiting for frame...")
             try:
-                frame_bytes = await asyncio.wait_for(
-                    websocket.receive_bytes(),
-                    timeout=5.0
-                )
+                frame_bytes = await frame_buffer.get(timeout=5.0)
+                frame_started = time.perf_counter()
+                stage_timer.record("queue", frame_buffer.last_wait)
 
                 if len(frame_bytes) > MAX_FRAME_SIZE:
                     await websocket.send_json({
@@ -82,81 +167,121 @@ async def video_websocket(websocket: WebSocket, db: Session = Depends(get_db)):
                     })
                     continue
 
-                np_arr = np.frombuffer(frame_bytes, np.uint8)
-                frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-                
+                with stage_timer.time("decode"):
+                    frame, gray = frame_decoder.decode(frame_bytes)
+
                 if frame is None:
-                    print("Frame decoding failed")
+                    logger.debug("Frame decoding failed")
                     await websocket.send_json({"error": "Invalid image data"})
                     continue
 
-                if not detect_faces(frame, return_bounding_boxes=False):
-                    await websocket.send_json({
-                        "emotion": "no_face",
-                        "confidence": 0,
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-                    continue
-
                 try:
-                    results = DeepFace.analyze(
-                        frame,
-                        actions=['emotion'],
-                        enforce_detection=False,
-                        detector_backend='opencv'
-                    )
-
-                    if not results or not isinstance(results, list):
-                        raise ValueError("Invalid analysis results")
-
-                    emotion_data = results[0]
-                    dominant_emotion = emotion_data.get("dominant_emotion", "unknown")
-                    emotion_confidences = emotion_data.get("emotion", {})
-                    confidence = float(emotion_confidences.get(dominant_emotion, 0))
+                    if change_detector.is_unchanged(gray):
+                        analysis = last_analysis
+                    else:
+                        inference_started = time.perf_counter()
+                        if face_tracker is not None:
+                            analysis, face_tracker = await run_tracked_inference(frame, gray, face_tracker, stage_timer)
+                            session.next_track_id = face_tracker.next_track_id
+                            # Watch the whole frame, any of the faces may change.
+                            change_detector.update(gray, None)
+                        else:
+                            roi = face_roi.next(gray.shape) if face_roi is not None else None
+                            analysis = await run_inference(frame, gray, roi, stage_timer)
+                            box = analysis["box"] if analysis else None
+                            change_detector.update(gray, box)
+                            if face_roi is not None:
+                                face_roi.update(box, gray.shape)
+                        last_analysis = analysis
+
+                        target_fps = frame_controller.record(
+                            time.perf_counter() - inference_started,
+                            pending_inferences()
+                        )
+                        if target_fps is not None:
+                            await websocket.send_json({
+                                "status": "throttle",
+                                "target_fps": target_fps
+                            })
+
+                    # Without smoothing every frame is sent and stored. The
+                    # session statistics always get the raw per-frame result;
+                    # the smoothed one is only what is sent and stored.
+                    raw_analysis = analysis
+                    stored_faces, emit = None, True
+                    if smoother is not None:
+                        analysis, stored_faces, emit = smoother.update(analysis, time.monotonic())
+
+                    if analysis is None:
+                        if emit:
+                            with stage_timer.time("send"):
+                                await result_sender.send("no_face", 0, datetime.utcnow())
+                            results_sent += 1
+                            results_sent_counter.inc()
+                        stage_timer.record("frame", time.perf_counter() - frame_started)
+                        continue
+
+                    dominant_emotion = analysis["emotion"]
+                    confidence = analysis["confidence"]
+                    probabilities = analysis.get("probabilities")
                     current_time = datetime.utcnow()
 
-                    emotion_record = {
-                        "emotion": dominant_emotion,
-                        "confidence": confidence,
-                        "timestamp": current_time
-                    }
-                    unsaved_emotions.append(emotion_record)
-                    session_emotions.append(emotion_record)
-
-                    if (current_time - last_save_time).total_seconds() >= EMOTION_SAVE_INTERVAL:
-                        try:
-                            for emotion in unsaved_emotions:
-                                save_emotion(
-                                    db=db,
-                                    user_id=user_id,
-                                    session_id=session_id,
-                                    emotion=emotion["emotion"],
-                                    intensity=emotion["confidence"]
-                                )
-                            unsaved_emotions = []
-                            last_save_time = current_time
-                            logger.info(f"Saved emotions at {current_time}")
-                        except Exception as e:
-                            logger.error(f"Error saving emotions: {str(e)}")
-                            db.rollback()
+                    raw_faces = raw_analysis.get("faces")
+                    for face in raw_faces or [raw_analysis]:
+                        session_stats.add(face["emotion"], face["confidence"], current_time, face.get("probabilities"))
+                        if raw_faces is not None:
+                            session.add_face(
+                                face["track_id"], face["emotion"], face["confidence"], current_time, face.get("probabilities")
+                            )
 
-                    await websocket.send_json({
-                        "emotion": dominant_emotion,
-                        "confidence": confidence,
-                        "timestamp": current_time.isoformat()
-                    })
+                    faces = analysis.get("faces")
+                    emotion_records = []
+                    for face in (faces or [analysis]) if stored_faces is None else stored_faces:
+                        emotion_record = {
+                            "emotion": face["emotion"],
+                            "confidence": face["confidence"],
+                            "timestamp": current_time,
+                            "face_id": face.get("track_id")
+                        }
+                        if settings.STORE_EMOTION_PROBABILITIES:
+                            emotion_record["probabilities"] = face.get("probabilities")
+                        emotion_records.append(emotion_record)
+
+                    if emotion_records:
+                        with stage_timer.time("save"):
+                            await emotion_writer.put(user_id, session_id, emotion_records)
 
                     frame_count += 1
+                    if not emit:
+                        stage_timer.record("frame", time.perf_counter() - frame_started)
+                        continue
+
+                    if faces is not None:
+                        # Report boxes in the coordinates of the frame the client sent.
+                        faces = [
+                            {**face, "box": [v * frame_decoder.frame_scale for v in face["box"]]}
+                            for face in faces
+                        ]
+
+                    with stage_timer.time("send"):
+                        await result_sender.send(
+                            dominant_emotion,
+                            confidence,
+                            current_time,
+                            probabilities,
+                            faces
+                        )
+
+                    results_sent += 1
+                    results_sent_counter.inc()
+                    stage_timer.record("frame", time.perf_counter() - frame_started)
 
                 except Exception as e:
                     logger.error(f"Analysis error: {str(e)}")
-                    await websocket.send_json({
-                        "emotion": "unknown",
-                        "confidence": 0,
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
+                    await result_sender.send("unknown", 0, datetime.utcnow())
 
-                await asyncio.sleep(FRAME_PROCESS_INTERVAL)
+                elapsed = time.perf_counter() - frame_started
+                await asyncio.sleep(max(0.0, frame_controller.frame_interval - elapsed))
 
             except asyncio.TimeoutError:
                 try:
@@ -165,8 +290,9 @@ async def video_websocket(websocket: WebSocket, db: Session = Depends(get_db)):
                     break
                 continue
 
-            except WebSocketDisconnect:
-                logger.info("Client disconnected normally")
+            except WebSocketDisconnect as e:
+                logger.info(f"Client disconnected (code {e.code})")
+                session_ended = e.code in SESSION_END_CODES
                 break
 
             except Exception as e:
@@ -176,60 +302,21 @@ async def video_websocket(websocket: WebSocket, db: Session = Depends(get_db)):
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
     finally:
+        if receiver_task is not None:
+            receiver_task.cancel()
+
         try:
-            if unsaved_emotions:
-                try:
-                    for emotion in unsaved_emotions:
-                        save_emotion(
-                            db=db,
-                            user_id=user_id,
-                            session_id=session_id,
-                            emotion=emotion["emotion"],
-                            intensity=emotion["confidence"]
-                        )
-                    logger.info("Saved remaining unsaved emotions")
-                except Exception as e:
-                    logger.error(f"Error saving remaining emotions: {str(e)}")
-                    db.rollback()
+            if session_ended:
+                # The client has already closed the socket; it hears about
+                # the report through the EMOTION_REPORT notification.
+                await session_registry.finish(session, generation)
+            else:
+                # Possibly just a flaky connection; keep the session around
+                # so the client can come back with ?session_id= and resume.
+                await session_registry.detach(session, generation)
 
-            if session_emotions:
-                try:
-                    first_timestamp = session_emotions[0]["timestamp"]
-                    last_timestamp = session_emotions[-1]["timestamp"]
-                    
-                    trend = save_emotion_trend(
-                        db=db,
-                        user_id=user_id,
-                        session_id=session_id,
-                        period_start=first_timestamp,
-                        period_end=last_timestamp
-                    )
-                    if trend:
-                        logger.info(f"Successfully saved emotion trend for session {session_id}")
-                        try:
-                            report_response = generate_emotion_monitoring_pdf_report(
-                                user_id=user_id,
-                                session_id=session_id,
-                                db=db
-                            )
-                            logger.info(f"Successfully generated report for session {session_id}")
-                            
-                            await websocket.send_json({
-                                 "status": "report_generated",
-                                 "session_id": session_id
-                            })
-                            
-                        except HTTPException as e:
-                            logger.error(f"Error generating report: {str(e.detail)}")
-                        except Exception as e:
-                            logger.error(f"Unexpected error generating report: {str(e)}")
-                    else:
-                        logger.warning(f"Failed to save emotion trend for session {session_id}")
-                except Exception as e:
-                    logger.error(f"Error saving emotion trend: {str(e)}")
-                    db.rollback()
-            
-            await websocket.close()
+            if websocket.client_state == WebSocketState.CONNECTED:
+                await websocket.close()
         except Exception as e:
             logger.error(f"Error during cleanup: {str(e)}")
 
@@ -238,5 +325,9 @@ async def video_websocket(websocket: WebSocket, db: Session = Depends(get_db)):
             f"Session ended | "
             f"Duration: {duration:.2f}s | "
             f"Frames: {frame_count} | "
-            f"FPS: {frame_count/max(duration, 0.1):.2f}"
+            f"Sent: {results_sent} | "
+            f"Dropped: {frame_buffer.dropped} | "
+            f"Reused: {change_detector.skip_ratio:.0%} | "
+            f"FPS: {frame_count/max(duration, 0.1):.2f} | "
+            f"Stages p50/p95/p99: {stage_timer.summary()}"
         )
\ No newline at end of file
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+from app.services import metrics
+
+skipped_frames_counter = metrics.counter(
+    "video_unchanged_frames_total", "Frames that reused the previous emotion result"
+)
+
+class FrameChangeDetector:
+    # Compares a small blurred grayscale thumbnail of the last known face
+    # region (or the whole frame when there is none) against the thumbnail
+    # taken when that region was last analysed. A frame of another size
+    # (the decoder switching scale, the client changing resolution) never
+    # matches, since the stored box is in the old frame's coordinates.
+
+    def __init__(self, threshold: float, max_skips: int, size: int = 32):
+        self.threshold = threshold
+        self.max_skips = max_skips
+        self.size = size
+        self.checked = 0
+        self.skipped = 0
+        self._box: Optional[list] = None
+        self._reference: Optional[np.ndarray] = None
+        self._shape: Optional[Tuple[int, int]] = None
+        self._consecutive = 0
+
+    @property
+    def skip_ratio(self) -> float:
+        return self.skipped / self.checked if self.checked else 0.0
+
+    def _signature(self, frame: np.ndarray) -> np.ndarray:
+        region = frame
+        if self._box is not None:
+            x, y, w, h = [int(v) for v in self._box]
+            # Pad the box so a face drifting out of it still counts as change.
+            pad_x, pad_y = w // 4, h // 4
+            region = frame[max(y - pad_y, 0):y + h + pad_y, max(x - pad_x, 0):x + w + pad_x]
+            if region.size == 0:
+                region = frame
+
+        gray = region if region.ndim == 2 else cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        thumbnail = cv2.resize(gray, (self.size, self.size), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(thumbnail, (3, 3), 0)
+
+    def is_unchanged(self, frame: np.ndarray) -> bool:
+        self.checked += 1
+
+        if self.threshold <= 0 or self._reference is None or self._consecutive >= self.max_skips:
+            return False
+
+        if frame.shape[:2] != self._shape:
+            self._box = self._reference = self._shape = None
+            return False
+
+        difference = float(cv2.absdiff(self._signature(frame), self._reference).mean())
+        if difference >= self.threshold:
+            return False
+
+        self._consecutive += 1
+        self.skipped += 1
+        skipped_frames_counter.inc()
+        return True
+
+    def update(self, frame: np.ndarray, box: Optional[list]):
+        self._box = box
+        self._shape = frame.shape[:2]
+        self._reference = self._signature(frame)
+        self._consecutive = 0
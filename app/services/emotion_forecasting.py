@@ -1,6 +1,5 @@
 import pandas as pd
 import numpy as np
-from prophet import Prophet
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from app.models import EmotionData
@@ -21,6 +20,10 @@ def get_emotion_forecast(user_id: int, db: Session, days_ahead: int = 7):
     df["count"] = 1
     df = df.groupby(["timestamp", "emotion"]).sum().reset_index()
 
+    # Prophet (and its Stan backend) is slow to import; only pay for it
+    # when a forecast is requested.
+    from prophet import Prophet
+
     emotions = df["emotion"].unique()
     forecasts = {}
 
@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+from app.utils.emotion_vector import EMOTION_LABELS
+from app.services.emotion_runtime import get_emotion_runtime
+EMOTION_INPUT_SIZE = 48
+
+def load_emotion_model():
+    # DeepFace pulls in TensorFlow; import it only when the Keras model is
+    # actually needed, not whenever this module is imported.
+    from deepface import DeepFace
+    return DeepFace.build_model(model_name="Emotion", task="facial_attribute")
+
+def preprocess_face(face: np.ndarray) -> np.ndarray:
+    if face is None or face.size == 0:
+        raise ValueError("Empty face crop")
+
+    gray = face if face.ndim == 2 else cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+
+    # Letterbox to a square like DeepFace does before its own resize, so the
+    # classifier sees the same aspect ratio as in DeepFace.analyze.
+    height, width = gray.shape
+    side = max(height, width)
+    pad_y, pad_x = side - height, side - width
+    gray = cv2.copyMakeBorder(
+        gray,
+        pad_y // 2, pad_y - pad_y // 2,
+        pad_x // 2, pad_x - pad_x // 2,
+        cv2.BORDER_CONSTANT, value=0
+    )
+    gray = cv2.resize(gray, (EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE))
+
+    return gray.astype(np.float32) / 255.0
+
+def predict_emotions(faces: np.ndarray) -> np.ndarray:
+    # faces: (n, 48, 48) float32 -> (n, 7) percentages summing to 100
+    batch = np.asarray(faces, dtype=np.float32)
+    predictions = np.asarray(get_emotion_runtime().predict(batch), dtype=np.float32)
+
+    totals = predictions.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1.0
+
+    return 100 * predictions / totals
+
+def to_analysis(probabilities: np.ndarray) -> dict:
+    index = int(np.argmax(probabilities))
+
+    return {
+        "emotion": EMOTION_LABELS[index],
+        "confidence": float(probabilities[index]),
+        "probabilities": [float(p) for p in probabilities],
+    }
@@ -0,0 +1,157 @@
+import os
+import threading
+from typing import Optional
+import numpy as np
+from app.config import settings
+from app.utils.emotion_vector import EMOTION_LABELS
+
+# Backends that run the DeepFace emotion classifier on (n, 48, 48) float32
+# crops in [0, 1] and return the (n, 7) softmax output. "keras" is the
+# reference model inside DeepFace; "onnx" and "tflite" load a copy exported
+# by scripts/export_emotion_model.py, optionally int8 quantized, and never
+# touch TensorFlow at inference time. "stub" needs no model at all and is
+# only meant for load tests such as benchmarks/ws_replay.py.
+
+RUNTIMES = ("keras", "onnx", "tflite", "stub")
+INPUT_SIZE = 48
+
+class KerasEmotionRuntime:
+    name = "keras"
+
+    def __init__(self):
+        from app.services.emotion_model import load_emotion_model
+        self.model = load_emotion_model().model
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.model(batch[..., np.newaxis], training=False).numpy()
+
+class OnnxEmotionRuntime:
+    name = "onnx"
+
+    def __init__(self, path: str, threads: int = 1):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise RuntimeError("EMOTION_RUNTIME=onnx needs the onnxruntime package")
+
+        options = onnxruntime.SessionOptions()
+        # Sessions run in inference workers that already parallelise across
+        # frames, so keep each one from spawning a thread per core.
+        options.intra_op_num_threads = max(1, threads)
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # InferenceSession.run is safe to call from several threads.
+        inputs = np.ascontiguousarray(batch[..., np.newaxis], dtype=np.float32)
+        return self.session.run(None, {self.input_name: inputs})[0]
+
+class TfliteEmotionRuntime:
+    name = "tflite"
+
+    def __init__(self, path: str, threads: int = 1):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tensorflow.lite import Interpreter
+            except ImportError:
+                raise RuntimeError("EMOTION_RUNTIME=tflite needs tflite-runtime or tensorflow")
+
+        self._interpreter_class = Interpreter
+        self.path = path
+        self.threads = max(1, threads)
+        # Interpreters are not thread-safe; one per inference thread.
+        self._local = threading.local()
+        self._interpreter(1)
+
+    def _interpreter(self, batch_size: int):
+        local = self._local
+        if not hasattr(local, "interpreter"):
+            local.interpreter = self._interpreter_class(model_path=self.path, num_threads=self.threads)
+            local.batch_size = None
+
+        interpreter = local.interpreter
+        if local.batch_size != batch_size:
+            input_index = interpreter.get_input_details()[0]["index"]
+            interpreter.resize_tensor_input(input_index, [batch_size, INPUT_SIZE, INPUT_SIZE, 1])
+            interpreter.allocate_tensors()
+            local.batch_size = batch_size
+
+        return interpreter
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        interpreter = self._interpreter(len(batch))
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+
+        inputs = batch[..., np.newaxis].astype(np.float32)
+        if input_details["dtype"] != np.float32:
+            # Fully int8 models take quantized input.
+            scale, zero_point = input_details["quantization"]
+            limits = np.iinfo(input_details["dtype"])
+            inputs = np.clip(np.round(inputs / scale + zero_point), limits.min, limits.max).astype(input_details["dtype"])
+
+        interpreter.set_tensor(input_details["index"], inputs)
+        interpreter.invoke()
+        outputs = interpreter.get_tensor(output_details["index"])
+
+        if output_details["dtype"] != np.float32:
+            scale, zero_point = output_details["quantization"]
+            outputs = (outputs.astype(np.float32) - zero_point) * scale
+
+        return outputs
+
+class StubEmotionRuntime:
+    name = "stub"
+
+    def __init__(self, seed: int = 0):
+        # Fixed random projection of a few crop statistics, so results are
+        # deterministic per crop and still change as the face does.
+        self.weights = np.random.default_rng(seed).normal(size=(4, len(EMOTION_LABELS))).astype(np.float32)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        flat = batch.reshape(len(batch), -1)
+        half = flat.shape[1] // 2
+        features = np.stack([
+            flat.mean(axis=1), flat.std(axis=1), flat[:, :half].mean(axis=1), flat[:, half:].mean(axis=1)
+        ], axis=1)
+        logits = features @ self.weights * 10
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+def build_runtime(name: str, path: Optional[str] = None, threads: int = 1):
+    if name == "keras":
+        return KerasEmotionRuntime()
+    if name == "stub":
+        return StubEmotionRuntime()
+
+    if name not in RUNTIMES:
+        raise ValueError(f"Unknown emotion runtime: {name}")
+    if not path or not os.path.exists(path):
+        raise RuntimeError(f"Exported emotion model not found at {path}; run scripts/export_emotion_model.py")
+
+    if name == "onnx":
+        return OnnxEmotionRuntime(path, threads)
+    return TfliteEmotionRuntime(path, threads)
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+def get_emotion_runtime():
+    global _runtime
+
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = build_runtime(
+                    settings.EMOTION_RUNTIME,
+                    settings.EMOTION_MODEL_PATH,
+                    settings.EMOTION_RUNTIME_THREADS
+                )
+
+    return _runtime
@@ -0,0 +1,129 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.utils.emotion_vector import EMOTION_LABELS
+
+class EmotionSmoother:
+    # Exponential moving average over one face's probability vector with
+    # hysteresis on the dominant emotion: another emotion takes over only
+    # once it leads the current one by switch_margin points and the current
+    # state has been held for min_hold seconds. The EMA weight follows the
+    # time between frames, so adaptive FPS does not change the smoothing.
+
+    def __init__(self, time_constant: float, switch_margin: float, min_hold: float):
+        self.time_constant = time_constant
+        self.switch_margin = switch_margin
+        self.min_hold = min_hold
+        self.smoothed: Optional[np.ndarray] = None
+        self.emotion: Optional[str] = None
+        self.changed_at = 0.0
+        self.updated_at = 0.0
+
+    @property
+    def confidence(self) -> float:
+        return float(self.smoothed[EMOTION_LABELS.index(self.emotion)])
+
+    @property
+    def probabilities(self) -> List[float]:
+        return [float(p) for p in self.smoothed]
+
+    def update(self, probabilities: Sequence[float], now: float) -> bool:
+        # Returns True when the smoothed emotion changed.
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if self.smoothed is None or self.time_constant <= 0:
+            self.smoothed = probabilities
+        else:
+            alpha = 1.0 - math.exp(-max(now - self.updated_at, 0.0) / self.time_constant)
+            self.smoothed = self.smoothed + alpha * (probabilities - self.smoothed)
+        self.updated_at = now
+
+        candidate = EMOTION_LABELS[int(np.argmax(self.smoothed))]
+        if self.emotion is None:
+            switch = True
+        elif candidate == self.emotion or now - self.changed_at < self.min_hold:
+            switch = False
+        else:
+            lead = self.smoothed[EMOTION_LABELS.index(candidate)] - self.smoothed[EMOTION_LABELS.index(self.emotion)]
+            switch = lead >= self.switch_margin
+
+        if switch:
+            self.emotion = candidate
+            self.changed_at = now
+        return switch
+
+class SessionSmoother:
+    # Smooths every face of a video session and decides what is worth
+    # sending and storing: a face whose smoothed emotion changed, the
+    # face(s) appearing or disappearing, and a heartbeat with the current
+    # state every heartbeat seconds. A face has to be missing for min_hold
+    # seconds before the session reports no_face, so detector misses do
+    # not flicker either.
+
+    def __init__(self, time_constant: float, switch_margin: float, min_hold: float, heartbeat: float):
+        self.time_constant = time_constant
+        self.switch_margin = switch_margin
+        self.min_hold = min_hold
+        self.heartbeat = heartbeat
+        self.faces: Dict[Optional[int], EmotionSmoother] = {}
+        self.no_face = False
+        self.missing_since: Optional[float] = None
+        self.emitted_at: Optional[float] = None
+
+    def _heartbeat_due(self, now: float) -> bool:
+        return self.emitted_at is None or (self.heartbeat > 0 and now - self.emitted_at >= self.heartbeat)
+
+    def update(self, analysis: Optional[dict], now: float) -> Tuple[Optional[dict], List[dict], bool]:
+        # Returns the smoothed analysis (None for no face), the faces to
+        # store and whether a result should be sent to the client.
+        if analysis is None:
+            if self.missing_since is None:
+                self.missing_since = now
+
+            emit = False
+            if not self.no_face:
+                if now - self.missing_since >= self.min_hold:
+                    self.no_face = True
+                    self.faces.clear()
+                    emit = True
+            elif self._heartbeat_due(now):
+                emit = True
+
+            if emit:
+                self.emitted_at = now
+            return None, [], emit
+
+        self.missing_since = None
+        appeared = self.no_face or self.emitted_at is None
+        self.no_face = False
+        heartbeat = self._heartbeat_due(now)
+
+        smoothed, changed = [], []
+        for face in analysis.get("faces") or [analysis]:
+            track_id = face.get("track_id")
+            smoother = self.faces.get(track_id)
+            if smoother is None:
+                smoother = self.faces[track_id] = EmotionSmoother(self.time_constant, self.switch_margin, self.min_hold)
+
+            emotion_changed = smoother.update(face["probabilities"], now)
+            result = {
+                **face,
+                "emotion": smoother.emotion,
+                "confidence": smoother.confidence,
+                "probabilities": smoother.probabilities,
+            }
+            smoothed.append(result)
+            if emotion_changed or heartbeat or appeared:
+                changed.append(result)
+
+        # Track ids are never reused; forget faces that have been gone a while.
+        forget_after = max(self.heartbeat, self.min_hold) * 5
+        for track_id in [track_id for track_id, smoother in self.faces.items() if now - smoother.updated_at > forget_after]:
+            del self.faces[track_id]
+
+        emit = bool(changed)
+        if emit:
+            self.emitted_at = now
+
+        if "faces" in analysis:
+            return {**smoothed[0], "faces": smoothed}, changed, emit
+        return smoothed[0], changed, emit
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+from sqlalchemy.exc import DataError, IntegrityError
+from app.config import settings
+from app.database import session_scope
+from app.repositories.emotion_repo import build_emotion_rows, save_emotion_rows
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+queue_depth_gauge = metrics.gauge(
+    "emotion_write_queue_depth", "Emotion samples waiting to be written"
+)
+flush_latency_histogram = metrics.histogram(
+    "emotion_write_flush_seconds", "Wall time of one batched emotion sample write"
+)
+flush_size_histogram = metrics.histogram(
+    "emotion_write_flush_rows", "Emotion samples written per flush",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 5000)
+)
+rows_written_counter = metrics.counter(
+    "emotion_rows_written_total", "Emotion samples written to the database"
+)
+rows_dropped_counter = metrics.counter(
+    "emotion_rows_dropped_total", "Emotion samples dropped after a failed write"
+)
+
+def _write_rows(rows: List[dict]) -> int:
+    with session_scope() as db:
+        return save_emotion_rows(db, rows)
+
+def _is_data_error(error: Optional[BaseException]) -> bool:
+    # Rows the database rejects (a deleted user, a constraint violation)
+    # fail the same way every time; anything else, like an outage, fails
+    # every row alike and is worth waiting out.
+    while error is not None:
+        if isinstance(error, (IntegrityError, DataError)):
+            return True
+        error = error.__cause__
+    return False
+
+def _write_rows_isolating(rows: List[dict]) -> Tuple[int, int, List[dict]]:
+    # Bisects a batch that keeps failing on bad data so those rows are
+    # dropped alone instead of blocking the rest. Returns (written, dropped,
+    # unwritten); unwritten are the rows left when the database itself
+    # failed part way through.
+    try:
+        return _write_rows(rows), 0, []
+    except Exception as e:
+        if not _is_data_error(e):
+            logger.error(f"Error writing {len(rows)} emotion samples: {str(e)}")
+            return 0, 0, rows
+        if len(rows) == 1:
+            logger.error(
+                f"Dropping emotion sample for user {rows[0]['user_id']} "
+                f"session {rows[0]['session_id']}: {str(e.__cause__ or e)}"
+            )
+            return 0, 1, []
+
+    middle = len(rows) // 2
+    written, dropped, unwritten = _write_rows_isolating(rows[:middle])
+    if unwritten:
+        return written, dropped, unwritten + rows[middle:]
+    written_right, dropped_right, unwritten = _write_rows_isolating(rows[middle:])
+    return written + written_right, dropped + dropped_right, unwritten
+
+class EmotionWriteBuffer:
+    # Write-behind queue shared by every video session in the process.
+    # Samples are flushed in one batch when flush_size rows are waiting,
+    # every flush_interval seconds, on demand, and on shutdown. While the
+    # database is unreachable, writes back off exponentially up to
+    # max_backoff and only the oldest samples beyond max_pending are shed.
+
+    def __init__(
+        self,
+        flush_size: int,
+        flush_interval: float,
+        max_pending: int,
+        max_attempts: int = 3,
+        max_backoff: float = 60.0
+    ):
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self.max_pending = max(self.flush_size, max_pending)
+        self.max_attempts = max(1, max_attempts)
+        self.max_backoff = max(flush_interval, max_backoff)
+        self._rows: List[dict] = []
+        # Failed batches with the number of times they were rejected whole.
+        self._retries: List[Tuple[List[dict], int]] = []
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows) + sum(len(rows) for rows, _ in self._retries)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"Emotion write buffer started (flush_size={self.flush_size}, "
+                f"flush_interval={self.flush_interval}s, max_pending={self.max_pending})"
+            )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush(force=True)
+
+    async def put(self, user_id: int, session_id: str, emotions: List[dict]):
+        self.start()
+        self._rows.extend(build_emotion_rows(user_id, session_id, emotions))
+        queue_depth_gauge.set(self.pending)
+
+        if self.pending >= self.max_pending:
+            # Writers fell behind; make this session wait for the flush.
+            await self.flush()
+        elif len(self._rows) >= self.flush_size:
+            self._wakeup.set()
+
+    async def flush(self, force: bool = False):
+        # force skips the backoff (shutdown, a session's report needing its rows).
+        if self._flush_lock is None:
+            self.start()
+
+        async with self._flush_lock:
+            if force or time.monotonic() >= self._retry_at:
+                batches = self._retries + ([(self._rows, 0)] if self._rows else [])
+                self._retries, self._rows = [], []
+
+                for index, (batch, attempts) in enumerate(batches):
+                    if not await self._write(batch, attempts):
+                        # The database is down; keep the rest for later.
+                        self._retries.extend(batches[index + 1:])
+                        break
+
+            self._shed()
+            queue_depth_gauge.set(self.pending)
+
+    async def _write(self, rows: List[dict], attempts: int) -> bool:
+        # Returns False when the database could not take the write; the
+        # rows are kept and writes back off.
+        if attempts >= self.max_attempts:
+            # Retrying the whole batch did not help; write what can be
+            # written and drop only the rows that fail on their own.
+            written, dropped, unwritten = await asyncio.to_thread(_write_rows_isolating, rows)
+            rows_written_counter.inc(written)
+            if dropped:
+                rows_dropped_counter.inc(dropped)
+            if unwritten:
+                self._retries.append((unwritten, attempts))
+                self._back_off()
+                return False
+            self._backoff = self._retry_at = 0.0
+            return True
+
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(_write_rows, rows)
+        except Exception as e:
+            if _is_data_error(e):
+                logger.error(f"Emotion samples rejected ({len(rows)} rows, attempt {attempts + 1}): {str(e.__cause__ or e)}")
+                self._retries.append((rows, attempts + 1))
+                return True
+
+            self._retries.append((rows, attempts))
+            self._back_off()
+            logger.error(f"Error flushing {len(rows)} emotion samples, retrying in {self._backoff:.1f}s: {str(e.__cause__ or e)}")
+            return False
+
+        self._backoff = self._retry_at = 0.0
+        flush_latency_histogram.observe(time.perf_counter() - started)
+        flush_size_histogram.observe(len(rows))
+        rows_written_counter.inc(len(rows))
+        return True
+
+    def _back_off(self):
+        self._backoff = min(self.max_backoff, self._backoff * 2 or self.flush_interval)
+        self._retry_at = time.monotonic() + self._backoff
+
+    def _shed(self):
+        # Drop the oldest samples that no longer fit in max_pending.
+        excess = self.pending - self.max_pending
+        if excess <= 0:
+            return
+
+        logger.error(f"Emotion write buffer full, dropping the {excess} oldest samples")
+        rows_dropped_counter.inc(excess)
+        while excess > 0 and self._retries:
+            rows, attempts = self._retries[0]
+            if len(rows) <= excess:
+                self._retries.pop(0)
+                excess -= len(rows)
+            else:
+                self._retries[0] = (rows[excess:], attempts)
+                excess = 0
+        del self._rows[:excess]
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+emotion_writer = EmotionWriteBuffer(
+    flush_size=settings.EMOTION_WRITE_FLUSH_SIZE,
+    flush_interval=settings.EMOTION_WRITE_FLUSH_INTERVAL,
+    max_pending=settings.EMOTION_WRITE_MAX_PENDING,
+    max_attempts=settings.EMOTION_WRITE_MAX_ATTEMPTS,
+    max_backoff=settings.EMOTION_WRITE_MAX_BACKOFF
+)
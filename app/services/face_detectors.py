@@ -0,0 +1,144 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+import cv2
+import numpy as np
+
+# Interchangeable face detectors. All of them take a grayscale or BGR image
+# and return [x, y, w, h] boxes in its coordinates. Model files for the
+# LBP cascade, the SSD and YuNet are not part of the OpenCV wheels and have
+# to be downloaded separately:
+#   lbp:   lbpcascade_frontalface_improved.xml (opencv/data/lbpcascades)
+#   dnn:   res10_300x300_ssd_iter_140000.caffemodel + deploy.prototxt
+#   yunet: face_detection_yunet_2023mar.onnx (opencv_zoo)
+
+DETECTORS = ("haar", "lbp", "dnn", "yunet")
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+def _to_bgr(image: np.ndarray) -> np.ndarray:
+    # The networks were trained on colour; a replicated gray frame works
+    # well enough and lets the pipeline keep passing gray only.
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image
+
+def _filter_sizes(boxes: List[list], min_size: Tuple[int, int], max_size: Optional[Tuple[int, int]]) -> List[list]:
+    return [
+        box for box in boxes
+        if box[2] >= min_size[0] and box[3] >= min_size[1]
+        and (max_size is None or (box[2] <= max_size[0] and box[3] <= max_size[1]))
+    ]
+
+class FaceDetector(ABC):
+    name = "base"
+
+    @abstractmethod
+    def detect(
+        self,
+        image: np.ndarray,
+        scale_factor: float = 1.05,
+        min_neighbors: int = 5,
+        min_size: Tuple[int, int] = (30, 30),
+        max_size: Optional[Tuple[int, int]] = None
+    ) -> List[list]:
+        ...
+
+class CascadeDetector(FaceDetector):
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.cascade = cv2.CascadeClassifier()
+        if not self.cascade.load(path):
+            raise IOError(f"Error loading cascade file {path}. Check OpenCV installation.")
+
+    def detect(self, image, scale_factor=1.05, min_neighbors=5, min_size=(30, 30), max_size=None):
+        faces = self.cascade.detectMultiScale(
+            _to_gray(image),
+            scaleFactor=scale_factor,
+            minNeighbors=min_neighbors,
+            minSize=min_size,
+            maxSize=max_size or (0, 0)
+        )
+        return faces.tolist() if len(faces) > 0 else []
+
+class DnnSsdDetector(FaceDetector):
+    name = "dnn"
+
+    def __init__(self, model_path: str, config_path: str, confidence: float = 0.6, input_size: int = 300):
+        self.model_path = model_path
+        self.config_path = config_path
+        self.confidence = confidence
+        self.input_size = input_size
+        # cv2.dnn nets are not safe to share between inference threads.
+        self._local = threading.local()
+        self._net()
+
+    def _net(self):
+        if not hasattr(self._local, "net"):
+            self._local.net = cv2.dnn.readNetFromCaffe(self.config_path, self.model_path)
+            self._local.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            self._local.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        return self._local.net
+
+    def detect(self, image, scale_factor=1.05, min_neighbors=5, min_size=(30, 30), max_size=None):
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(
+            _to_bgr(image), 1.0, (self.input_size, self.input_size), (104.0, 177.0, 123.0)
+        )
+        net = self._net()
+        net.setInput(blob)
+        detections = net.forward()[0, 0]
+
+        boxes = []
+        for detection in detections[detections[:, 2] >= self.confidence]:
+            x1, y1 = max(int(detection[3] * width), 0), max(int(detection[4] * height), 0)
+            x2, y2 = min(int(detection[5] * width), width), min(int(detection[6] * height), height)
+            if x2 > x1 and y2 > y1:
+                boxes.append([x1, y1, x2 - x1, y2 - y1])
+
+        return _filter_sizes(boxes, min_size, max_size)
+
+class YuNetDetector(FaceDetector):
+    name = "yunet"
+
+    def __init__(self, model_path: str, confidence: float = 0.6):
+        self.model_path = model_path
+        self.confidence = confidence
+        self._local = threading.local()
+        self._detector((320, 320))
+
+    def _detector(self, size: Tuple[int, int]):
+        if not hasattr(self._local, "detector"):
+            self._local.detector = cv2.FaceDetectorYN.create(self.model_path, "", size, self.confidence)
+        self._local.detector.setInputSize(size)
+        return self._local.detector
+
+    def detect(self, image, scale_factor=1.05, min_neighbors=5, min_size=(30, 30), max_size=None):
+        height, width = image.shape[:2]
+        _, faces = self._detector((width, height)).detect(_to_bgr(image))
+        if faces is None:
+            return []
+
+        boxes = [[int(x), int(y), int(w), int(h)] for x, y, w, h in faces[:, :4]]
+        return _filter_sizes(boxes, min_size, max_size)
+
+def build_detector(
+    name: str,
+    model_path: Optional[str] = None,
+    config_path: Optional[str] = None,
+    confidence: float = 0.6
+) -> FaceDetector:
+    if name == "haar":
+        return CascadeDetector("haar", model_path or cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    if name == "lbp":
+        if not model_path:
+            raise ValueError("The lbp detector needs a cascade file (FACE_DETECTOR_MODEL)")
+        return CascadeDetector("lbp", model_path)
+    if name == "dnn":
+        if not model_path or not config_path:
+            raise ValueError("The dnn detector needs FACE_DETECTOR_MODEL and FACE_DETECTOR_CONFIG")
+        return DnnSsdDetector(model_path, config_path, confidence)
+    if name == "yunet":
+        if not model_path:
+            raise ValueError("The yunet detector needs an ONNX model (FACE_DETECTOR_MODEL)")
+        return YuNetDetector(model_path, confidence)
+    raise ValueError(f"Unknown face detector: {name}")
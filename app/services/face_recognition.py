@@ -1,19 +1,159 @@
+import math
+import threading
+from typing import Optional, Tuple
 import cv2
 import numpy as np
+from app.config import settings
+from app.services import metrics
+from app.services.face_detectors import FaceDetector, build_detector
 
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+full_scans_counter = metrics.counter(
+    "face_detection_full_scans_total", "Face detections that scanned the whole frame"
+)
+roi_scans_counter = metrics.counter(
+    "face_detection_roi_scans_total", "Face detections limited to the window around the last face"
+)
+roi_misses_counter = metrics.counter(
+    "face_detection_roi_misses_total", "Window detections that found nothing and fell back to a full scan"
+)
 
-if not face_cascade.load(cv2.data.haarcascades + "haarcascade_frontalface_default.xml"):
-    raise IOError("Error loading Haar Cascade XML file. Check OpenCV installation.")
+EYE_CASCADE_PATH = cv2.data.haarcascades + "haarcascade_eye.xml"
+eye_cascade = cv2.CascadeClassifier(EYE_CASCADE_PATH)
+if eye_cascade.empty():
+    raise IOError(f"Error loading cascade file {EYE_CASCADE_PATH}. Check OpenCV installation.")
 
-def detect_faces(image: np.ndarray, scale_factor: float = 1.05, min_neighbors: int = 5, min_size: tuple = (30, 30), return_bounding_boxes: bool = True):
-    if image is None or not isinstance(image, np.ndarray) or image.size == 0:
-        raise ValueError("Invalid image input. Ensure it's a non-empty NumPy array.")
+_detector: Optional[FaceDetector] = None
+_detector_lock = threading.Lock()
 
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=scale_factor, minNeighbors=min_neighbors, minSize=min_size)
+def get_face_detector() -> FaceDetector:
+    # Called from executor threads; the lock keeps them from each building
+    # (and loading the model files for) their own detector.
+    global _detector
+
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = build_detector(
+                    settings.FACE_DETECTOR,
+                    model_path=settings.FACE_DETECTOR_MODEL,
+                    config_path=settings.FACE_DETECTOR_CONFIG,
+                    confidence=settings.FACE_DETECTOR_CONFIDENCE
+                )
+
+    return _detector
+
+def detect_faces(image: np.ndarray, scale_factor: float = 1.05, min_neighbors: int = 5, min_size: tuple = (30, 30), return_bounding_boxes: bool = True, gray: np.ndarray = None):
+    if gray is None:
+        if image is None or not isinstance(image, np.ndarray) or image.size == 0:
+            raise ValueError("Invalid image input. Ensure it's a non-empty NumPy array.")
+
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    faces = get_face_detector().detect(gray, scale_factor=scale_factor, min_neighbors=min_neighbors, min_size=min_size)
 
     if return_bounding_boxes:
-        return faces.tolist() if len(faces) > 0 else []
+        return faces
     else:
         return len(faces) > 0
+
+def detect_faces_near(gray: np.ndarray, box, expand: float = 0.5, scale_factor: float = 1.05, min_neighbors: int = 5):
+    # Scan only a window around the last face, and only for faces of about
+    # its size, which skips most positions and most cascade scales.
+    x, y, w, h = [int(v) for v in box]
+    height, width = gray.shape[:2]
+    pad_x, pad_y = int(w * expand), int(h * expand)
+    left, top = max(x - pad_x, 0), max(y - pad_y, 0)
+    right, bottom = min(x + w + pad_x, width), min(y + h + pad_y, height)
+
+    window = gray[top:bottom, left:right]
+    if window.size == 0:
+        return []
+
+    min_size = (max(int(w * 0.7), 20), max(int(h * 0.7), 20))
+    max_size = (min(int(w * 1.5), right - left), min(int(h * 1.5), bottom - top))
+    if max_size[0] < min_size[0] or max_size[1] < min_size[1]:
+        return []
+
+    faces = get_face_detector().detect(
+        window, scale_factor=scale_factor, min_neighbors=min_neighbors, min_size=min_size, max_size=max_size
+    )
+
+    return [[fx + left, fy + top, fw, fh] for fx, fy, fw, fh in faces]
+
+SCAN_FULL = "full"
+SCAN_WINDOW = "window"
+SCAN_WINDOW_MISS = "window_miss"
+
+def detect_faces_roi(gray: np.ndarray, roi=None) -> Tuple[list, str]:
+    # Returns the boxes and the kind of scan that found them. This may run
+    # in a process worker whose counters never reach /metrics, so the
+    # caller counts the scan with count_scan() in the main process.
+    if roi is not None:
+        boxes = detect_faces_near(gray, roi)
+        if boxes:
+            return boxes, SCAN_WINDOW
+        return detect_faces(None, return_bounding_boxes=True, gray=gray), SCAN_WINDOW_MISS
+
+    return detect_faces(None, return_bounding_boxes=True, gray=gray), SCAN_FULL
+
+def count_scan(scan: Optional[str]):
+    if scan is None:
+        return
+    if scan != SCAN_FULL:
+        roi_scans_counter.inc()
+    if scan == SCAN_WINDOW_MISS:
+        roi_misses_counter.inc()
+    if scan != SCAN_WINDOW:
+        full_scans_counter.inc()
+
+class FaceRoi:
+    # Remembers where the face was so the next detection can search around
+    # it. Every full_scan_every frames, and whenever the face is lost or the
+    # frame size changes, the whole frame is scanned again.
+
+    def __init__(self, full_scan_every: int):
+        self.full_scan_every = max(1, full_scan_every)
+        self._box: Optional[list] = None
+        self._shape = None
+        self._since_full_scan = 0
+
+    def next(self, shape) -> Optional[list]:
+        if self._box is None or shape != self._shape or self._since_full_scan >= self.full_scan_every:
+            self._since_full_scan = 0
+            return None
+
+        self._since_full_scan += 1
+        return self._box
+
+    def update(self, box: Optional[list], shape):
+        self._box = box
+        self._shape = shape
+
+def largest_box(boxes: list):
+    return max(boxes, key=lambda box: box[2] * box[3])
+
+def align_face(face: np.ndarray) -> np.ndarray:
+    gray = face if face.ndim == 2 else cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+    eyes = eye_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=10)
+
+    if len(eyes) < 2:
+        return face
+
+    # Rotate so the two most prominent eyes sit on a horizontal line.
+    eyes = sorted(eyes.tolist(), key=lambda eye: eye[2] * eye[3], reverse=True)[:2]
+    (lx, ly), (rx, ry) = sorted((x + w / 2, y + h / 2) for x, y, w, h in eyes)
+    angle = math.degrees(math.atan2(ry - ly, rx - lx))
+
+    height, width = face.shape[:2]
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+
+    return cv2.warpAffine(face, rotation, (width, height))
+
+def crop_face(image: np.ndarray, box, align: bool = True) -> np.ndarray:
+    x, y, w, h = [int(v) for v in box]
+    x, y = max(x, 0), max(y, 0)
+    face = image[y:y + h, x:x + w]
+
+    if face.size == 0:
+        raise ValueError("Face box lies outside the image.")
+
+    return align_face(face) if align else face
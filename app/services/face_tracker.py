@@ -0,0 +1,151 @@
+from typing import Callable, List, Optional
+import cv2
+import numpy as np
+
+def box_iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    intersection = inter_w * inter_h
+    return intersection / float(aw * ah + bw * bh - intersection)
+
+def centroid_distance(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return float(np.hypot((ax + aw / 2) - (bx + bw / 2), (ay + ah / 2) - (by + bh / 2)))
+
+class Track:
+    def __init__(self, track_id: int, box: list, template: np.ndarray):
+        self.track_id = track_id
+        self.box = box
+        self.template = template
+        self.misses = 0
+
+class FaceTracker:
+    # Runs the detector every detect_every frames and follows the faces in
+    # between with template matching in a window around each last box.
+    # Detections are associated to tracks by IoU, falling back to centroid
+    # distance for fast movement, so track ids stay stable across frames.
+
+    def __init__(
+        self,
+        detect_every: int,
+        iou_threshold: float = 0.3,
+        max_misses: int = 2,
+        max_faces: int = 4,
+        min_match_score: float = 0.5,
+        first_track_id: int = 1
+    ):
+        self.detect_every = max(1, detect_every)
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.max_faces = max(1, max_faces)
+        self.min_match_score = min_match_score
+        self.next_track_id = first_track_id
+        self.tracks: List[Track] = []
+        self.frame_index = 0
+        self.detections = 0
+        self._shape = None
+
+    def _template(self, gray: np.ndarray, box) -> Optional[np.ndarray]:
+        x, y, w, h = [int(v) for v in box]
+        patch = gray[max(y, 0):y + h, max(x, 0):x + w]
+        return patch.copy() if patch.size else None
+
+    def _associate(self, gray: np.ndarray, boxes: list):
+        # Greedy matching: best IoU pairs first, then nearest centroids
+        # within one face width for whatever is left.
+        pairs = []
+        for track_index, track in enumerate(self.tracks):
+            for box_index, box in enumerate(boxes):
+                iou = box_iou(track.box, box)
+                if iou >= self.iou_threshold:
+                    pairs.append((1.0 + iou, track_index, box_index))
+                else:
+                    distance = centroid_distance(track.box, box)
+                    if distance < max(track.box[2], box[2]):
+                        pairs.append((1.0 - distance / max(track.box[2], box[2]), track_index, box_index))
+
+        matched_tracks, matched_boxes = set(), set()
+        for _, track_index, box_index in sorted(pairs, reverse=True):
+            if track_index in matched_tracks or box_index in matched_boxes:
+                continue
+            matched_tracks.add(track_index)
+            matched_boxes.add(box_index)
+
+            track = self.tracks[track_index]
+            track.box = boxes[box_index]
+            track.template = self._template(gray, track.box)
+            track.misses = 0
+
+        for track_index, track in enumerate(self.tracks):
+            if track_index not in matched_tracks:
+                track.misses += 1
+
+        for box_index, box in enumerate(boxes):
+            if box_index not in matched_boxes:
+                self.tracks.append(Track(self.next_track_id, box, self._template(gray, box)))
+                self.next_track_id += 1
+
+    def _follow(self, gray: np.ndarray, track: Track) -> bool:
+        if track.template is None:
+            return False
+
+        x, y, w, h = [int(v) for v in track.box]
+        height, width = gray.shape[:2]
+        pad_x, pad_y = w // 2, h // 2
+        left, top = max(x - pad_x, 0), max(y - pad_y, 0)
+        window = gray[top:min(y + h + pad_y, height), left:min(x + w + pad_x, width)]
+
+        template_h, template_w = track.template.shape[:2]
+        if window.shape[0] < template_h or window.shape[1] < template_w:
+            return False
+
+        scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (match_x, match_y) = cv2.minMaxLoc(scores)
+        if score < self.min_match_score:
+            return False
+
+        track.box = [left + match_x, top + match_y, template_w, template_h]
+        return True
+
+    def _rescale(self, shape):
+        # The decoder switched resolution: move the tracks into the new
+        # coordinates and let the detector refresh their templates.
+        scale_y, scale_x = shape[0] / self._shape[0], shape[1] / self._shape[1]
+        for track in self.tracks:
+            x, y, w, h = track.box
+            track.box = [int(x * scale_x), int(y * scale_y), int(w * scale_x), int(h * scale_y)]
+            track.template = None
+        self.frame_index = 0
+
+    def update(self, gray: np.ndarray, detect: Callable[[np.ndarray], list]) -> List[Track]:
+        if self._shape is not None and gray.shape[:2] != self._shape:
+            self._rescale(gray.shape[:2])
+        self._shape = gray.shape[:2]
+
+        if not self.tracks or self.frame_index % self.detect_every == 0:
+            self.detections += 1
+            self._associate(gray, detect(gray))
+        else:
+            for track in self.tracks:
+                if not self._follow(gray, track):
+                    track.misses += 1
+
+        self.frame_index += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        if any(track.misses for track in self.tracks):
+            # Something was lost; detect again on the next frame.
+            self.frame_index = 0
+
+        # Only faces seen this frame are classified; largest first.
+        visible = sorted(
+            (track for track in self.tracks if track.misses == 0),
+            key=lambda track: track.box[2] * track.box[3],
+            reverse=True
+        )
+        return visible[:self.max_faces]
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from typing import Callable, List, Optional
+from app.services import metrics
+
+dropped_frames_counter = metrics.counter(
+    "video_dropped_frames_total", "Frames replaced by a newer frame before they were processed"
+)
+throttle_counter = metrics.counter(
+    "video_throttle_messages_total", "Target FPS changes sent to video clients"
+)
+
+class LatestFrameBuffer:
+    # Single-slot buffer between the socket reader and the frame processor.
+    # A message that arrives while the previous one is still waiting
+    # replaces it, so a slow session falls behind by at most one message.
+    # Frames bundled into one message are handed out in order.
+
+    def __init__(self):
+        self._frames: List[bytes] = []
+        self._event = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        self._received_at = 0.0
+        self.dropped = 0
+        # How long the frame last handed out sat in the buffer.
+        self.last_wait = 0.0
+
+    def put(self, frame: bytes):
+        self.put_many([frame])
+
+    def put_many(self, frames: List[bytes]):
+        if self._frames:
+            self.dropped += len(self._frames)
+            dropped_frames_counter.inc(len(self._frames))
+        self._frames = list(frames)
+        self._received_at = time.perf_counter()
+        if self._frames:
+            self._event.set()
+
+    def close(self, error: BaseException):
+        self._error = error
+        self._event.set()
+
+    async def get(self, timeout: float) -> bytes:
+        if not self._frames and self._error is None:
+            self._event.clear()
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+
+        if not self._frames:
+            raise self._error
+
+        self.last_wait = time.perf_counter() - self._received_at
+        return self._frames.pop(0)
+
+async def receive_frames(websocket, buffer: LatestFrameBuffer, unpack: Optional[Callable[[bytes], List[bytes]]] = None):
+    try:
+        while True:
+            message = await websocket.receive_bytes()
+            if unpack is None:
+                buffer.put(message)
+                continue
+
+            try:
+                buffer.put_many(unpack(message))
+            except ValueError:
+                # Let the decoder reject it like any other bad frame.
+                buffer.put(message)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        buffer.close(e)
+
+class AdaptiveFrameController:
+    # AIMD rate control: back off multiplicatively when this session's
+    # inference latency or the process-wide inference backlog is too high,
+    # and recover one FPS at a time once both have headroom again.
+
+    def __init__(
+        self,
+        min_fps: int,
+        max_fps: int,
+        target_latency_ms: float,
+        max_pending: int,
+        adjust_interval: float = 1.0
+    ):
+        self.min_fps = max(1, min_fps)
+        self.max_fps = max(self.min_fps, max_fps)
+        self.target_latency = target_latency_ms / 1000.0
+        self.max_pending = max(1, max_pending)
+        self.adjust_interval = adjust_interval
+        self.target_fps = self.max_fps
+        self.latency_ewma: Optional[float] = None
+        self._last_adjusted = time.monotonic()
+
+    @property
+    def frame_interval(self) -> float:
+        return 1.0 / self.target_fps
+
+    def record(self, latency: float, pending: int) -> Optional[int]:
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma = 0.7 * self.latency_ewma + 0.3 * latency
+
+        now = time.monotonic()
+        if now - self._last_adjusted < self.adjust_interval:
+            return None
+        self._last_adjusted = now
+
+        load = pending / self.max_pending
+        target_fps = self.target_fps
+
+        if self.latency_ewma > self.target_latency or load > 1.0:
+            target_fps = max(self.min_fps, int(target_fps * 0.75))
+        elif self.latency_ewma < self.target_latency / 2 and load < 0.75:
+            target_fps = min(self.max_fps, target_fps + 1)
+
+        if target_fps == self.target_fps:
+            return None
+
+        self.target_fps = target_fps
+        throttle_counter.inc()
+        return target_fps
@@ -0,0 +1,59 @@
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+_REDUCED_COLOR_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+class FrameDecoder:
+    # Per-session decode stage. JPEG frames are decoded at a reduced scale
+    # once we know the stream is larger than the pipeline needs, and the
+    # grayscale conversion is written into a buffer reused across frames
+    # and shared by detection and classification.
+
+    def __init__(self, min_side: int):
+        self.min_side = min_side
+        self.scale = 1
+        # Scale the last returned frame was decoded at; multiply boxes by
+        # it to get back to the client's coordinates.
+        self.frame_scale = 1
+        self._gray: Optional[np.ndarray] = None
+        self._full_shape: Optional[Tuple[int, int]] = None
+
+    def _choose_scale(self, height: int, width: int) -> int:
+        scale = 1
+        if self.min_side <= 0:
+            return scale
+        for candidate in (2, 4, 8):
+            if min(height, width) // candidate >= self.min_side:
+                scale = candidate
+        return scale
+
+    def decode(self, frame_bytes: bytes):
+        # np.frombuffer wraps the received bytes without copying them.
+        buffer = np.frombuffer(frame_bytes, np.uint8)
+        frame = cv2.imdecode(buffer, _REDUCED_COLOR_FLAGS[self.scale])
+
+        if frame is None:
+            return None, None
+
+        self.frame_scale = self.scale
+        height, width = frame.shape[:2]
+        full_shape = (height * self.scale, width * self.scale)
+
+        if full_shape != self._full_shape:
+            # First frame or the client changed resolution: pick the scale
+            # for the following frames from the full-size dimensions.
+            self._full_shape = full_shape
+            self.scale = self._choose_scale(*full_shape)
+
+        if self._gray is None or self._gray.shape != (height, width):
+            self._gray = np.empty((height, width), dtype=np.uint8)
+
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        return frame, self._gray
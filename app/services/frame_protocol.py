@@ -0,0 +1,142 @@
+import struct
+import time
+from datetime import datetime
+from typing import List, Optional, Sequence
+from app.utils.emotion_vector import EMOTION_LABELS
+
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+
+# Binary result message, little endian:
+#   uint8  flags        bit 0 set when the probability vector follows
+#   uint8  emotion      index into EMOTION_LABELS, or one of the codes below
+#   uint8  confidence   dominant confidence, 0-100% scaled to 0-255
+#   uint32 timestamp    ms since the session started (monotonic, wraps)
+#   uint8[7]            optional probabilities, same scaling, EMOTION_LABELS order
+#   uint8 count         multi-face mode only, bit 1 of flags set, followed by
+#   count x (uint8 track id mod 256, uint8 emotion, uint8 confidence)
+RESULT_HEADER = struct.Struct("<BBBI")
+FACE_RESULT = struct.Struct("<BBB")
+FLAG_PROBABILITIES = 0x01
+FLAG_FACES = 0x02
+NO_FACE_CODE = 254
+UNKNOWN_CODE = 255
+
+# Inbound bundle of several JPEG frames in one message:
+#   b"EMFB", uint8 count, then count x (uint32 length, bytes)
+BUNDLE_MAGIC = b"EMFB"
+BUNDLE_LENGTH = struct.Struct("<I")
+
+_EMOTION_CODES = {label: index for index, label in enumerate(EMOTION_LABELS)}
+_EMOTION_CODES["no_face"] = NO_FACE_CODE
+
+def _quantize(percent: float) -> int:
+    return max(0, min(255, round(percent * 2.55)))
+
+def pack_result(
+    emotion: str,
+    confidence: float,
+    elapsed_ms: int,
+    probabilities: Optional[Sequence[float]] = None,
+    faces: Optional[List[dict]] = None
+) -> bytes:
+    flags = FLAG_PROBABILITIES if probabilities is not None else 0
+    if faces is not None:
+        flags |= FLAG_FACES
+    message = RESULT_HEADER.pack(
+        flags,
+        _EMOTION_CODES.get(emotion, UNKNOWN_CODE),
+        _quantize(confidence),
+        elapsed_ms & 0xFFFFFFFF
+    )
+
+    if probabilities is not None:
+        message += bytes(_quantize(p) for p in probabilities)
+
+    if faces is not None:
+        message += bytes([len(faces)])
+        for face in faces:
+            message += FACE_RESULT.pack(
+                face["track_id"] & 0xFF,
+                _EMOTION_CODES.get(face["emotion"], UNKNOWN_CODE),
+                _quantize(face["confidence"])
+            )
+
+    return message
+
+def unpack_frames(message: bytes) -> List[bytes]:
+    if not message.startswith(BUNDLE_MAGIC):
+        return [message]
+
+    if len(message) <= len(BUNDLE_MAGIC):
+        raise ValueError("Truncated frame bundle")
+
+    count = message[len(BUNDLE_MAGIC)]
+    offset = len(BUNDLE_MAGIC) + 1
+    frames = []
+
+    for _ in range(count):
+        if offset + BUNDLE_LENGTH.size > len(message):
+            raise ValueError("Truncated frame bundle")
+        (length,) = BUNDLE_LENGTH.unpack_from(message, offset)
+        offset += BUNDLE_LENGTH.size
+        if offset + length > len(message):
+            raise ValueError("Truncated frame bundle")
+        frames.append(message[offset:offset + length])
+        offset += length
+
+    return frames
+
+class ResultSender:
+    def __init__(self, websocket, protocol: str = PROTOCOL_JSON, include_probabilities: bool = False):
+        if protocol not in (PROTOCOL_JSON, PROTOCOL_BINARY):
+            raise ValueError(f"Unknown protocol: {protocol}")
+
+        self.websocket = websocket
+        self.protocol = protocol
+        self.include_probabilities = include_probabilities
+        self._started = time.monotonic()
+
+    def handshake(self) -> dict:
+        if self.protocol == PROTOCOL_JSON:
+            return {}
+        return {
+            "protocol": PROTOCOL_BINARY,
+            "emotions": EMOTION_LABELS,
+            "no_face_code": NO_FACE_CODE,
+            "unknown_code": UNKNOWN_CODE,
+            "probabilities": self.include_probabilities,
+        }
+
+    async def send(
+        self,
+        emotion: str,
+        confidence: float,
+        timestamp: datetime,
+        probabilities: Optional[Sequence[float]] = None,
+        faces: Optional[List[dict]] = None
+    ):
+        if self.protocol == PROTOCOL_BINARY:
+            elapsed_ms = int((time.monotonic() - self._started) * 1000)
+            if not self.include_probabilities:
+                probabilities = None
+            elif probabilities is None:
+                probabilities = [0.0] * len(EMOTION_LABELS)
+            await self.websocket.send_bytes(pack_result(emotion, confidence, elapsed_ms, probabilities, faces))
+            return
+
+        message = {
+            "emotion": emotion,
+            "confidence": confidence,
+            "timestamp": timestamp.isoformat()
+        }
+        if self.include_probabilities and probabilities is not None:
+            message["probabilities"] = dict(zip(EMOTION_LABELS, [float(p) for p in probabilities]))
+        if faces is not None:
+            message["faces"] = [{
+                "track_id": face["track_id"],
+                "emotion": face["emotion"],
+                "confidence": face["confidence"],
+                "box": face["box"],
+            } for face in faces]
+        await self.websocket.send_json(message)
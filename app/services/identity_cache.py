@@ -0,0 +1,34 @@
+import time
+from typing import Dict, Optional, Tuple
+from app.config import settings
+
+# token -> (user_id, expires_at) for the video socket handshake. Reconnect
+# storms resolve each token once per TTL instead of hitting the users table
+# on every handshake. The cache is per process: logout and login evict the
+# token here, but other worker processes keep accepting it for up to
+# WS_AUTH_CACHE_TTL seconds.
+_identity_cache: Dict[str, Tuple[int, float]] = {}
+
+def cached_identity(token: str) -> Optional[int]:
+    cached = _identity_cache.get(token)
+    if cached and cached[1] > time.time():
+        return cached[0]
+    return None
+
+def cache_identity(token: str, user_id: int, payload: dict):
+    now = time.time()
+    if len(_identity_cache) >= settings.WS_AUTH_CACHE_MAX_SIZE:
+        for cached_token, (_, expires_at) in list(_identity_cache.items()):
+            if expires_at <= now:
+                del _identity_cache[cached_token]
+        if len(_identity_cache) >= settings.WS_AUTH_CACHE_MAX_SIZE:
+            _identity_cache.clear()
+
+    expires_at = now + settings.WS_AUTH_CACHE_TTL
+    if payload.get("exp"):
+        expires_at = min(expires_at, float(payload["exp"]))
+    _identity_cache[token] = (user_id, expires_at)
+
+def forget_identity(token: Optional[str]):
+    if token:
+        _identity_cache.pop(token, None)
@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Optional
+import cv2
+import numpy as np
+from app.config import settings
+from app.services.face_recognition import detect_faces, detect_faces_roi, count_scan, crop_face, largest_box
+from app.services.emotion_model import EMOTION_LABELS, preprocess_face, predict_emotions, to_analysis
+from app.services.emotion_runtime import get_emotion_runtime
+from app.services.face_tracker import FaceTracker
+from app.services.inference_batcher import InferenceBatcher
+from app.services.stage_timer import StageTimer, timed
+from app.services.remote_inference import get_remote_inference_client, shutdown_remote_inference
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_executor: Optional[Executor] = None
+_batcher: Optional[InferenceBatcher] = None
+_pending = 0
+
+def _preload_models():
+    # Models are cached per process, so every worker pays the model
+    # construction once here instead of on its first frame.
+    get_emotion_runtime()
+
+def warm_up_worker() -> float:
+    started = time.perf_counter()
+
+    frame = np.full((240, 320, 3), 128, dtype=np.uint8)
+    detect_faces(frame, return_bounding_boxes=False)
+    predict_emotions(preprocess_face(frame)[np.newaxis])
+
+    return time.perf_counter() - started
+
+def warm_up_process(barrier, timeout: float = 600.0) -> float:
+    try:
+        seconds = warm_up_worker()
+    except Exception:
+        # Release the workers already waiting instead of leaving them
+        # blocked on the barrier until the timeout.
+        barrier.abort()
+        raise
+    # Hold this worker until every other one has taken its own task, so the
+    # pool cannot hand two warm-up tasks to the same process and leave
+    # another one cold.
+    barrier.wait(timeout)
+    return seconds
+
+def extract_face(frame: Optional[np.ndarray], gray: Optional[np.ndarray] = None, roi: Optional[list] = None):
+    # Returns ((face, box) or None, scan); scan is the detect_faces_roi scan
+    # kind in the crop pipeline and None otherwise.
+    if settings.INFERENCE_PIPELINE == "crop":
+        # Reuse the Haar boxes instead of letting DeepFace detect again.
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        boxes, scan = detect_faces_roi(gray, roi)
+        if not boxes:
+            return None, scan
+        box = largest_box(boxes)
+        # The classifier only needs grayscale, so crop the shared gray frame
+        # when there is no colour frame to crop.
+        return (crop_face(frame if frame is not None else gray, box), box), scan
+
+    if not detect_faces(frame, return_bounding_boxes=False, gray=gray):
+        return None, None
+
+    from deepface import DeepFace
+    faces = DeepFace.extract_faces(
+        frame,
+        detector_backend='opencv',
+        enforce_detection=False,
+        align=True,
+        color_face='bgr',
+        normalize_face=False
+    )
+
+    if not faces:
+        return None, None
+
+    area = faces[0]["facial_area"]
+    return (faces[0]["face"].astype(np.uint8), [area["x"], area["y"], area["w"], area["h"]]), None
+
+def prepare_face(frame: Optional[np.ndarray], gray: Optional[np.ndarray] = None, roi: Optional[list] = None):
+    extracted, scan = extract_face(frame, gray, roi)
+    if extracted is None:
+        return None, scan
+
+    face, box = extracted
+    return (preprocess_face(face), box), scan
+
+def prepare_tracked_faces(frame: Optional[np.ndarray], gray: Optional[np.ndarray], tracker: FaceTracker):
+    if gray is None:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    tracks = tracker.update(gray, lambda image: detect_faces(None, return_bounding_boxes=True, gray=image))
+
+    prepared = []
+    for track in tracks:
+        box = [int(v) for v in track.box]
+        try:
+            face = crop_face(frame if frame is not None else gray, box)
+        except ValueError:
+            continue
+        prepared.append((track.track_id, preprocess_face(face), box))
+
+    # The tracker travels back with the result so process workers work too.
+    return prepared, tracker
+
+def analyze_frame(frame: np.ndarray, gray: Optional[np.ndarray] = None, roi: Optional[list] = None):
+    # Returns (analysis or None, scan) like extract_face.
+    scan = None
+    if settings.INFERENCE_PIPELINE == "crop":
+        extracted, scan = extract_face(frame, gray, roi)
+        if extracted is None:
+            return None, scan
+        image, box = extracted
+        detector_backend = 'skip'
+    else:
+        if not detect_faces(frame, return_bounding_boxes=False, gray=gray):
+            return None, None
+        image = frame
+        box = None
+        detector_backend = 'opencv'
+
+    from deepface import DeepFace
+    results = DeepFace.analyze(
+        image,
+        actions=['emotion'],
+        enforce_detection=False,
+        detector_backend=detector_backend
+    )
+
+    if not results or not isinstance(results, list):
+        raise ValueError("Invalid analysis results")
+
+    emotion_data = results[0]
+    dominant_emotion = emotion_data.get("dominant_emotion", "unknown")
+    emotion_confidences = emotion_data.get("emotion", {})
+
+    if box is None:
+        region = emotion_data.get("region", {})
+        box = [region.get("x", 0), region.get("y", 0), region.get("w", 0), region.get("h", 0)]
+
+    return {
+        "emotion": dominant_emotion,
+        "confidence": float(emotion_confidences.get(dominant_emotion, 0)),
+        "probabilities": [float(emotion_confidences.get(label, 0)) for label in EMOTION_LABELS],
+        "box": box,
+    }, scan
+
+def get_inference_executor() -> Executor:
+    global _executor
+
+    if _executor is None:
+        workers = max(1, settings.INFERENCE_WORKERS)
+        # With a remote backend the executor only detects and crops faces.
+        initializer = _preload_models if settings.INFERENCE_BACKEND == "local" else None
+
+        if settings.INFERENCE_EXECUTOR == "process":
+            # TensorFlow is not fork-safe, so workers are spawned fresh.
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer
+            )
+        elif settings.INFERENCE_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="inference",
+                initializer=initializer
+            )
+        else:
+            raise ValueError(f"Unknown inference executor: {settings.INFERENCE_EXECUTOR}")
+
+        logger.info(f"Started {settings.INFERENCE_EXECUTOR} inference executor with {workers} workers")
+
+    return _executor
+
+def get_inference_batcher() -> InferenceBatcher:
+    global _batcher
+
+    if _batcher is None:
+        _batcher = InferenceBatcher(
+            executor=get_inference_executor(),
+            max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+            max_wait_ms=settings.INFERENCE_MAX_BATCH_WAIT_MS
+        )
+
+    return _batcher
+
+def pending_inferences() -> int:
+    return _pending
+
+async def _classify(faces: List[np.ndarray]) -> List[np.ndarray]:
+    if settings.INFERENCE_BACKEND == "redis":
+        client = get_remote_inference_client()
+        return await asyncio.gather(*[client.submit(face) for face in faces])
+
+    if settings.INFERENCE_BATCHING:
+        batcher = get_inference_batcher()
+        return await asyncio.gather(*[batcher.submit(face) for face in faces])
+
+    loop = asyncio.get_running_loop()
+    return list(await loop.run_in_executor(get_inference_executor(), predict_emotions, np.stack(faces)))
+
+async def run_inference(
+    frame: np.ndarray,
+    gray: Optional[np.ndarray] = None,
+    roi: Optional[list] = None,
+    timer: Optional[StageTimer] = None
+):
+    # roi: last known face box; in the crop pipeline detection searches
+    # around it first and scans the full frame only if nothing is there.
+    global _pending
+    loop = asyncio.get_running_loop()
+
+    _pending += 1
+    try:
+        remote = settings.INFERENCE_BACKEND == "redis"
+
+        # DeepFace.analyze is only an option for the reference Keras model.
+        if not remote and not settings.INFERENCE_BATCHING and settings.EMOTION_RUNTIME == "keras":
+            with timed(timer, "analyze"):
+                analysis, scan = await loop.run_in_executor(get_inference_executor(), analyze_frame, frame, gray, roi)
+            count_scan(scan)
+            return analysis
+
+        if gray is not None and settings.INFERENCE_PIPELINE == "crop":
+            # Detection and the batched classifier both run on grayscale,
+            # so the colour frame never has to reach the worker.
+            frame = None
+
+        with timed(timer, "detect"):
+            prepared, scan = await loop.run_in_executor(get_inference_executor(), prepare_face, frame, gray, roi)
+        count_scan(scan)
+        if prepared is None:
+            return None
+
+        face, box = prepared
+        with timed(timer, "classify"):
+            probabilities = (await _classify([face]))[0]
+
+        analysis = to_analysis(probabilities)
+        analysis["box"] = box
+        return analysis
+    finally:
+        _pending -= 1
+
+async def run_tracked_inference(
+    frame: np.ndarray,
+    gray: Optional[np.ndarray],
+    tracker: FaceTracker,
+    timer: Optional[StageTimer] = None
+):
+    # Multi-face mode: every visible track is classified. Returns the
+    # largest face's analysis with all of them under "faces", or None.
+    global _pending
+    loop = asyncio.get_running_loop()
+
+    _pending += 1
+    try:
+        if gray is not None:
+            frame = None
+
+        with timed(timer, "detect"):
+            prepared, tracker = await loop.run_in_executor(
+                get_inference_executor(), prepare_tracked_faces, frame, gray, tracker
+            )
+        if not prepared:
+            return None, tracker
+
+        with timed(timer, "classify"):
+            probabilities = await _classify([face for _, face, _ in prepared])
+
+        faces = []
+        for (track_id, _, box), result in zip(prepared, probabilities):
+            analysis = to_analysis(result)
+            analysis["box"] = box
+            analysis["track_id"] = track_id
+            faces.append(analysis)
+
+        return {**faces[0], "faces": faces}, tracker
+    finally:
+        _pending -= 1
+
+async def shutdown_inference():
+    global _batcher
+
+    if _batcher is not None:
+        await _batcher.stop()
+        _batcher = None
+
+    await shutdown_remote_inference()
+    shutdown_inference_executor()
+
+def shutdown_inference_executor():
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from typing import Optional
+import numpy as np
+from app.services.emotion_model import predict_emotions
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+batch_size_histogram = metrics.histogram(
+    "inference_batch_size", "Face crops per emotion model forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+batch_fill_histogram = metrics.histogram(
+    "inference_batch_fill_ratio", "Batch size divided by the configured max batch size",
+    buckets=(0.1, 0.25, 0.5, 0.75, 1.0)
+)
+queue_latency_histogram = metrics.histogram(
+    "inference_queue_latency_seconds", "Time a face crop waits before its batch is dispatched"
+)
+batch_latency_histogram = metrics.histogram(
+    "inference_batch_latency_seconds", "Wall time of one batched emotion model forward pass"
+)
+queue_depth_gauge = metrics.gauge(
+    "inference_queue_depth", "Face crops waiting for the emotion model"
+)
+
+class InferenceBatcher:
+    # Collects face crops from every video session on this process and runs
+    # them through the emotion model together, fanning results back out.
+
+    def __init__(self, executor: Executor, max_batch_size: int = 16, max_wait_ms: float = 10.0):
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"Inference batcher started (max_batch_size={self.max_batch_size}, "
+                f"max_wait_ms={self.max_wait * 1000:.1f})"
+            )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference batcher stopped"))
+
+    async def submit(self, face: np.ndarray) -> np.ndarray:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((face, future, time.perf_counter()))
+        queue_depth_gauge.set(self._queue.qsize())
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = await self._collect()
+            queue_depth_gauge.set(self._queue.qsize())
+
+            # Sockets that went away while waiting no longer need a result.
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            dispatched_at = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                queue_latency_histogram.observe(dispatched_at - enqueued_at)
+            batch_size_histogram.observe(len(batch))
+            batch_fill_histogram.observe(len(batch) / self.max_batch_size)
+
+            faces = np.stack([face for face, _, _ in batch])
+
+            try:
+                probabilities = await loop.run_in_executor(self.executor, predict_emotions, faces)
+            except Exception as e:
+                logger.error(f"Batched inference failed: {str(e)}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            batch_latency_histogram.observe(time.perf_counter() - dispatched_at)
+
+            for (_, future, _), result in zip(batch, probabilities):
+                if not future.done():
+                    future.set_result(result)
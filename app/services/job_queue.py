@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Job, JobStatus, Notification, NotificationType, NotificationStatus
+from app.services.report_service import generate_emotion_monitoring_pdf_report
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SESSION_FINISHED_JOB = "session_finished"
+
+def handle_session_finished(db: Session, payload: dict):
+    user_id = payload["user_id"]
+    session_id = payload["session_id"]
+
+    try:
+        generate_emotion_monitoring_pdf_report(user_id=user_id, session_id=session_id, db=db)
+    except HTTPException as e:
+        raise RuntimeError(e.detail)
+
+    notification = Notification(
+        user_id=user_id,
+        notification_type=NotificationType.EMOTION_REPORT,
+        title="Your emotion report is ready",
+        message=f"The report for monitoring session {session_id} has been generated and is available under Reports.",
+        status=NotificationStatus.SENT,
+        sent_at=datetime.utcnow(),
+    )
+    db.add(notification)
+    db.commit()
+
+    logger.info(f"Successfully generated report for session {session_id}")
+
+JOB_HANDLERS: Dict[str, Callable[[Session, dict], None]] = {
+    SESSION_FINISHED_JOB: handle_session_finished,
+}
+
+def enqueue_job(db: Session, job_type: str, payload: dict) -> Job:
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+
+    job = Job(job_type=job_type, payload=payload, status=JobStatus.PENDING, attempts=0)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    return job
+
+def requeue_stale_jobs(stale_after: float, max_attempts: int) -> Tuple[int, int]:
+    # Jobs left RUNNING by a process that died are picked up again, unless
+    # they have used up their attempts: a job that keeps killing its
+    # process (OOM, a crash while rendering) would otherwise run forever.
+    # Returns (requeued, failed).
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        stale = db.query(Job).filter(
+            Job.status == JobStatus.RUNNING,
+            Job.started_at < now - timedelta(seconds=stale_after)
+        )
+        failed = stale.filter(Job.attempts >= max_attempts).update({
+            Job.status: JobStatus.FAILED,
+            Job.error: "Worker stopped while running the job",
+            Job.finished_at: now,
+        }, synchronize_session=False)
+        requeued = stale.filter(Job.attempts < max_attempts).update(
+            {Job.status: JobStatus.PENDING}, synchronize_session=False
+        )
+        db.commit()
+        return requeued, failed
+    finally:
+        db.close()
+
+def claim_next_job():
+    db = SessionLocal()
+    try:
+        job = (
+            db.query(Job)
+            .filter(Job.status == JobStatus.PENDING)
+            .order_by(Job.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not job:
+            return None
+
+        # Conditional update so two workers can never both claim the job,
+        # even on databases that ignore SKIP LOCKED.
+        claimed = db.query(Job).filter(
+            Job.id == job.id,
+            Job.status == JobStatus.PENDING
+        ).update({
+            Job.status: JobStatus.RUNNING,
+            Job.attempts: Job.attempts + 1,
+            Job.started_at: datetime.utcnow(),
+        }, synchronize_session=False)
+        db.commit()
+
+        if not claimed:
+            return None
+
+        return job.id, job.job_type, dict(job.payload)
+    finally:
+        db.close()
+
+def run_job(job_id: int, job_type: str, payload: dict, max_attempts: int):
+    db = SessionLocal()
+    try:
+        JOB_HANDLERS[job_type](db, payload)
+
+        job = db.query(Job).filter(Job.id == job_id).first()
+        job.status = JobStatus.COMPLETED
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Job {job_id} ({job_type}) failed: {str(e)}")
+
+        job = db.query(Job).filter(Job.id == job_id).first()
+        job.error = str(e)
+        if job.attempts >= max_attempts:
+            job.status = JobStatus.FAILED
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = JobStatus.PENDING
+        db.commit()
+
+    finally:
+        db.close()
+
+class JobQueue:
+    # In-process workers over the persistent jobs table. Enqueued work
+    # survives restarts because the table, not memory, is the queue.
+
+    def __init__(
+        self,
+        workers: int,
+        poll_interval: float,
+        max_attempts: int,
+        stale_after: float,
+        sweep_interval: float = 60.0,
+        shutdown_timeout: float = 30.0
+    ):
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.max_attempts = max(1, max_attempts)
+        self.stale_after = stale_after
+        self.sweep_interval = sweep_interval
+        self.shutdown_timeout = shutdown_timeout
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Set[asyncio.Task] = set()
+        self._last_sweep = 0.0
+
+    async def start(self):
+        if self._tasks:
+            return
+
+        self._wakeup = asyncio.Event()
+        await self._sweep()
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # Cancelling the workers does not stop the threads running jobs;
+        # let them finish so shutdown does not leave them half done.
+        if self._running:
+            _, pending = await asyncio.wait(self._running, timeout=self.shutdown_timeout)
+            if pending:
+                logger.warning(
+                    f"{len(pending)} jobs still running after {self.shutdown_timeout}s; "
+                    f"they will be requeued once stale"
+                )
+
+    async def _sweep(self):
+        # Jobs left RUNNING by a crashed or redeployed worker go back to
+        # PENDING once they are older than stale_after, or fail once they
+        # are out of attempts.
+        self._last_sweep = time.monotonic()
+        try:
+            requeued, failed = await asyncio.to_thread(requeue_stale_jobs, self.stale_after, self.max_attempts)
+            if requeued:
+                logger.info(f"Requeued {requeued} stale jobs")
+            if failed:
+                logger.warning(f"Marked {failed} stale jobs as failed after {self.max_attempts} attempts")
+        except Exception as e:
+            logger.error(f"Error requeueing stale jobs: {str(e)}")
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _wait(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+
+            if time.monotonic() - self._last_sweep >= self.sweep_interval:
+                await self._sweep()
+
+            try:
+                claimed = await asyncio.to_thread(claim_next_job)
+            except Exception as e:
+                logger.error(f"Error claiming job: {str(e)}")
+                claimed = None
+
+            if claimed is None:
+                await self._wait()
+                continue
+
+            job = asyncio.create_task(asyncio.to_thread(run_job, *claimed, self.max_attempts))
+            self._running.add(job)
+            job.add_done_callback(self._running.discard)
+            # Shielded so stop() can wait for the job instead of dropping it.
+            await asyncio.shield(job)
+
+job_queue = JobQueue(
+    workers=settings.JOB_WORKERS,
+    poll_interval=settings.JOB_POLL_INTERVAL,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    stale_after=settings.JOB_STALE_AFTER,
+    sweep_interval=settings.JOB_SWEEP_INTERVAL,
+    shutdown_timeout=settings.JOB_SHUTDOWN_TIMEOUT
+)
@@ -0,0 +1,164 @@
+import threading
+from typing import Dict, Optional, Sequence
+
+# Small in-process metrics registry. Values are updated from the event loop
+# and from inference worker threads, so every metric guards its state.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Counter:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> dict:
+        return {"value": self.value}
+
+class Gauge:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def snapshot(self) -> dict:
+        return {"value": self.value}
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.bucket_counts[i] += 1
+                    break
+
+    def percentile(self, q: float) -> float:
+        # Estimated by linear interpolation inside the bucket holding the
+        # q-th observation, like Prometheus' histogram_quantile. Values past
+        # the last bucket are reported as the largest one seen.
+        with self._lock:
+            counts = list(self.bucket_counts)
+            count = self.count
+            largest = self.max
+
+        if not count:
+            return 0.0
+
+        rank = q * count
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets, counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                return min(lower + (bound - lower) * (rank - cumulative) / bucket_count, largest)
+            cumulative += bucket_count
+            lower = bound
+        return largest
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {
+                "count": self.count,
+                "sum": self.sum,
+                "avg": self.sum / self.count if self.count else 0.0,
+                "max": self.max,
+            }
+        for q in (0.5, 0.95, 0.99):
+            result[f"p{int(q * 100)}"] = self.percentile(q)
+        return result
+
+    def cumulative_buckets(self):
+        with self._lock:
+            counts = list(self.bucket_counts)
+            count = self.count
+            total = self.sum
+
+        cumulative = 0
+        buckets = []
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            buckets.append((bound, cumulative))
+        return buckets, count, total
+
+_registry: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+def _get_or_create(cls, name: str, description: str, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name, description, **kwargs)
+            _registry[name] = metric
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {type(metric).__name__}")
+        return metric
+
+def counter(name: str, description: str) -> Counter:
+    return _get_or_create(Counter, name, description)
+
+def gauge(name: str, description: str) -> Gauge:
+    return _get_or_create(Gauge, name, description)
+
+def histogram(name: str, description: str, buckets: Optional[Sequence[float]] = None) -> Histogram:
+    return _get_or_create(Histogram, name, description, buckets=buckets or DEFAULT_BUCKETS)
+
+def snapshot() -> dict:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {metric.name: metric.snapshot() for metric in metrics}
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+def render_prometheus() -> str:
+    # Prometheus text exposition format (version 0.0.4).
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        if isinstance(metric, Histogram):
+            buckets, count, total = metric.cumulative_buckets()
+            lines.append(f"# TYPE {metric.name} histogram")
+            for bound, cumulative in buckets:
+                lines.append(f'{metric.name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric.name}_bucket{{le="+Inf"}} {count}')
+            lines.append(f"{metric.name}_sum {_format_value(total)}")
+            lines.append(f"{metric.name}_count {count}")
+        else:
+            kind = "counter" if isinstance(metric, Counter) else "gauge"
+            lines.append(f"# TYPE {metric.name} {kind}")
+            lines.append(f"{metric.name} {_format_value(metric.value)}")
+
+    return "\n".join(lines) + "\n"
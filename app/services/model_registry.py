@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from typing import Dict, Optional
+from app.config import settings
+from app.services.emotion_runtime import get_emotion_runtime
+from app.services.inference import get_inference_executor, warm_up_worker, warm_up_process
+from app.services.remote_inference import get_remote_inference_client
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class ModelRegistry:
+    def __init__(self):
+        self.models: Dict[str, object] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+
+    async def load(self):
+        if settings.INFERENCE_BACKEND == "redis":
+            await self._connect_remote()
+            return
+
+        loop = asyncio.get_running_loop()
+        executor = get_inference_executor()
+        started = time.perf_counter()
+
+        try:
+            if settings.INFERENCE_EXECUTOR == "process":
+                await self._warm_up_processes(loop, executor)
+            else:
+                # Thread workers share this process's model.
+                await loop.run_in_executor(executor, warm_up_worker)
+
+            if settings.INFERENCE_EXECUTOR == "thread":
+                self.models["emotion"] = get_emotion_runtime()
+
+            self.warmup_seconds = time.perf_counter() - started
+            self.ready = True
+            logger.info(f"Emotion model ({settings.EMOTION_RUNTIME}) warmed up in {self.warmup_seconds:.2f}s")
+
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Error warming up emotion model: {str(e)}")
+
+    async def _warm_up_processes(self, loop, executor):
+        # Process workers each hold their own model copy. One task per
+        # worker, all waiting on a shared barrier, so every process runs
+        # exactly one warm-up pass before the first real frame.
+        workers = max(1, settings.INFERENCE_WORKERS)
+        manager = await asyncio.to_thread(multiprocessing.get_context("spawn").Manager)
+        try:
+            barrier = manager.Barrier(workers)
+            results = await asyncio.gather(*[
+                loop.run_in_executor(executor, warm_up_process, barrier) for _ in range(workers)
+            ], return_exceptions=True)
+            # A failing worker aborts the barrier; report its error rather
+            # than the BrokenBarrierError of the workers it released.
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                raise next((e for e in errors if not isinstance(e, threading.BrokenBarrierError)), errors[0])
+        finally:
+            await asyncio.to_thread(manager.shutdown)
+
+    async def _connect_remote(self):
+        # The model lives in the inference workers; this process is ready
+        # as soon as it can reach their queue.
+        started = time.perf_counter()
+        try:
+            await get_remote_inference_client().ping()
+            self.warmup_seconds = time.perf_counter() - started
+            self.ready = True
+            logger.info(f"Connected to remote inference at {settings.INFERENCE_REDIS_URL}")
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Error connecting to remote inference: {str(e)}")
+
+model_registry = ModelRegistry()
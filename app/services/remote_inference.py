@@ -0,0 +1,147 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Dict, Optional
+import numpy as np
+import redis.asyncio as aioredis
+from app.config import settings
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+REQUEST_STREAM = "emotion_inference:requests"
+WORKER_GROUP = "emotion_inference_workers"
+REPLY_PREFIX = "emotion_inference:replies:"
+
+remote_latency_histogram = metrics.histogram(
+    "inference_remote_latency_seconds", "Round trip of one face crop through the shared inference tier"
+)
+remote_timeouts_counter = metrics.counter(
+    "inference_remote_timeouts_total", "Face crops the shared inference tier did not answer in time"
+)
+
+def encode_face(face: np.ndarray) -> bytes:
+    # preprocess_face output is uint8 / 255, so this round trip is lossless
+    # and a quarter of the float32 size on the wire.
+    return np.rint(face * 255.0).astype(np.uint8).tobytes()
+
+def decode_face(data: bytes, size: int) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.uint8).reshape(size, size).astype(np.float32) / 255.0
+
+class RemoteInferenceClient:
+    # Sends face crops to the inference worker pool over a Redis stream and
+    # waits for the probabilities on a reply list owned by this process.
+
+    def __init__(self, url: str, timeout: float, max_stream_length: int):
+        self.url = url
+        self.timeout = timeout
+        self.max_stream_length = max_stream_length
+        self.reply_key = REPLY_PREFIX + uuid.uuid4().hex
+        self._redis: Optional[aioredis.Redis] = None
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._futures)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._redis = aioredis.from_url(self.url)
+            self._task = asyncio.create_task(self._listen())
+            logger.info(f"Remote inference client started (reply list {self.reply_key})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(RuntimeError("Remote inference client stopped"))
+        self._futures.clear()
+
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def ping(self):
+        self.start()
+        await self._redis.ping()
+
+    async def submit(self, face: np.ndarray) -> np.ndarray:
+        self.start()
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._futures[request_id] = future
+        started = time.perf_counter()
+
+        try:
+            await self._redis.xadd(
+                REQUEST_STREAM,
+                {"id": request_id, "reply_to": self.reply_key, "face": encode_face(face)},
+                maxlen=self.max_stream_length,
+                approximate=True
+            )
+            result = await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            remote_timeouts_counter.inc()
+            raise
+        finally:
+            self._futures.pop(request_id, None)
+
+        remote_latency_histogram.observe(time.perf_counter() - started)
+        return result
+
+    async def _listen(self):
+        while True:
+            try:
+                reply = await self._redis.blpop([self.reply_key], timeout=1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reading inference replies: {str(e)}")
+                await asyncio.sleep(1.0)
+                continue
+
+            if reply is None:
+                continue
+
+            message = json.loads(reply[1])
+            future = self._futures.get(message["id"])
+            if future is None or future.done():
+                # Caller already timed out.
+                continue
+
+            if "error" in message:
+                future.set_exception(RuntimeError(message["error"]))
+            else:
+                future.set_result(np.asarray(message["probabilities"], dtype=np.float32))
+
+_client: Optional[RemoteInferenceClient] = None
+
+def get_remote_inference_client() -> RemoteInferenceClient:
+    global _client
+
+    if _client is None:
+        _client = RemoteInferenceClient(
+            url=settings.INFERENCE_REDIS_URL,
+            timeout=settings.INFERENCE_REMOTE_TIMEOUT,
+            max_stream_length=settings.INFERENCE_REMOTE_MAX_QUEUE
+        )
+
+    return _client
+
+async def shutdown_remote_inference():
+    global _client
+
+    if _client is not None:
+        await _client.stop()
+        _client = None
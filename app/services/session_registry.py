@@ -0,0 +1,316 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from redis.exceptions import WatchError
+from app.config import settings
+from app.database import session_scope, redis_client
+from app.repositories.emotion_repo import save_emotion_trend_summary
+from app.services import metrics
+from app.services.emotion_writer import emotion_writer
+from app.services.job_queue import job_queue, enqueue_job, SESSION_FINISHED_JOB
+from app.services.session_stats import SessionEmotionAccumulator
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+resumed_sessions_counter = metrics.counter(
+    "video_sessions_resumed_total", "Video sessions resumed after a reconnect"
+)
+expired_sessions_counter = metrics.counter(
+    "video_sessions_expired_total", "Disconnected video sessions finalized after the grace period"
+)
+
+class VideoSession:
+    def __init__(self, session_id: str, user_id: int):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.stats = SessionEmotionAccumulator()
+        # Multi-face mode: one accumulator per track, keyed by str(track id).
+        # Ids keep counting across reconnects so tracks never merge.
+        self.face_stats: Dict[str, SessionEmotionAccumulator] = {}
+        self.next_track_id = 1
+        # Bumped on every attach so a socket that was taken over cannot
+        # park or finalize the session it no longer owns.
+        self.generation = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "stats": self.stats.to_dict(),
+            "face_stats": {track_id: stats.to_dict() for track_id, stats in self.face_stats.items()},
+            "next_track_id": self.next_track_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "VideoSession":
+        session = cls(data["session_id"], data["user_id"])
+        session.stats = SessionEmotionAccumulator.from_dict(data["stats"])
+        session.face_stats = {
+            track_id: SessionEmotionAccumulator.from_dict(stats) for track_id, stats in data["face_stats"].items()
+        }
+        session.next_track_id = data["next_track_id"]
+        return session
+
+    def add_face(self, track_id: int, emotion: str, intensity: float, timestamp, probabilities=None):
+        self.face_stats.setdefault(str(track_id), SessionEmotionAccumulator()).add(
+            emotion, intensity, timestamp, probabilities
+        )
+
+    def face_summaries(self) -> Optional[dict]:
+        if not self.face_stats:
+            return None
+        return {
+            track_id: {
+                "summary": stats.summary(),
+                "average_intensity": stats.average_intensity(),
+                "period_start": stats.period_start.isoformat() if stats.period_start else None,
+                "period_end": stats.period_end.isoformat() if stats.period_end else None,
+            }
+            for track_id, stats in self.face_stats.items()
+        }
+
+class MemorySessionStore:
+    # Disconnected sessions parked in this process only.
+
+    def __init__(self):
+        self._sessions: Dict[str, Tuple[dict, float]] = {}
+
+    def park(self, state: dict, deadline: float):
+        self._sessions[state["session_id"]] = (state, deadline)
+
+    def take(self, session_id: str, user_id: Optional[int] = None) -> Optional[dict]:
+        # With user_id, only that user's session is taken; others stay parked.
+        parked = self._sessions.get(session_id)
+        if parked is None or (user_id is not None and parked[0]["user_id"] != user_id):
+            return None
+        del self._sessions[session_id]
+        return parked[0]
+
+    def take_expired(self, now: float) -> List[dict]:
+        expired = [session_id for session_id, (_, deadline) in self._sessions.items() if deadline <= now]
+        return [self._sessions.pop(session_id)[0] for session_id in expired]
+
+    def take_all(self) -> List[dict]:
+        states = [state for state, _ in self._sessions.values()]
+        self._sessions.clear()
+        return states
+
+class RedisSessionStore:
+    # Disconnected sessions parked in Redis, so a client can resume on any
+    # worker and a session outlives the process that served it. Deadlines
+    # live in a sorted set; whichever worker removes an entry owns it.
+
+    KEY_PREFIX = "video_session:"
+    DEADLINES_KEY = "video_session_deadlines"
+
+    def __init__(self, client, grace_period: float):
+        self.client = client
+        self.ttl = int(grace_period) + 3600
+
+    def park(self, state: dict, deadline: float):
+        pipe = self.client.pipeline()
+        pipe.set(self.KEY_PREFIX + state["session_id"], json.dumps(state), ex=self.ttl)
+        pipe.zadd(self.DEADLINES_KEY, {state["session_id"]: deadline})
+        pipe.execute()
+
+    def take(self, session_id: str, user_id: Optional[int] = None) -> Optional[dict]:
+        # With user_id, only that user's session is taken; others stay parked.
+        key = self.KEY_PREFIX + session_id
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                data = pipe.get(key)
+                if not data:
+                    pipe.unwatch()
+                    self.client.zrem(self.DEADLINES_KEY, session_id)
+                    return None
+
+                state = json.loads(data)
+                if user_id is not None and state["user_id"] != user_id:
+                    pipe.unwatch()
+                    return None
+
+                pipe.multi()
+                pipe.delete(key)
+                pipe.zrem(self.DEADLINES_KEY, session_id)
+                pipe.execute()
+                return state
+            except WatchError:
+                # Another worker took or re-parked it first.
+                return None
+
+    def take_expired(self, now: float) -> List[dict]:
+        states = []
+        for session_id in self.client.zrangebyscore(self.DEADLINES_KEY, 0, now):
+            state = self.take(session_id)
+            if state is not None:
+                states.append(state)
+        return states
+
+    def take_all(self) -> List[dict]:
+        # Other workers (or the next start) finalize what is left in Redis.
+        return []
+
+def _save_session_results(session: VideoSession):
+    with session_scope() as db:
+        trend = save_emotion_trend_summary(
+            db=db,
+            user_id=session.user_id,
+            session_id=session.session_id,
+            period_start=session.stats.period_start,
+            period_end=session.stats.period_end,
+            emotion_summary=session.stats.summary(),
+            average_intensity=session.stats.average_intensity(),
+            mean_probabilities=session.stats.mean_probabilities(),
+            face_summaries=session.face_summaries()
+        )
+        if not trend:
+            logger.warning(f"Failed to save emotion trend for session {session.session_id}")
+            return None
+
+        logger.info(f"Successfully saved emotion trend for session {session.session_id}")
+
+        # Report rendering happens on the job queue so it never blocks the
+        # event loop serving live sessions.
+        return enqueue_job(
+            db=db,
+            job_type=SESSION_FINISHED_JOB,
+            payload={"user_id": session.user_id, "session_id": session.session_id}
+        )
+
+class SessionRegistry:
+    # Keeps video sessions alive across dropped sockets. A session that
+    # disconnects is parked for grace_period seconds; reconnecting with its
+    # session_id picks the accumulator back up, otherwise the reaper saves
+    # the trend and queues the report exactly once.
+
+    def __init__(self, store, grace_period: float, reap_interval: float):
+        self.store = store
+        self.grace_period = grace_period
+        self.reap_interval = reap_interval
+        self._attached: Dict[str, VideoSession] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for state in self.store.take_all():
+            await self.finalize(VideoSession.from_dict(state))
+
+    async def open(self, user_id: int, session_id: Optional[str] = None) -> Tuple[VideoSession, bool]:
+        if session_id:
+            session = self._attached.get(session_id)
+
+            if session is None:
+                # Only this user's parked session is taken; a foreign id
+                # leaves the owner's session and its deadline untouched.
+                try:
+                    state = await asyncio.to_thread(self.store.take, session_id, user_id)
+                except Exception as e:
+                    logger.error(f"Error loading session {session_id}: {str(e)}")
+                    state = None
+
+                if state is not None:
+                    session = VideoSession.from_dict(state)
+
+            if session is not None and session.user_id == user_id:
+                session.generation += 1
+                self._attached[session.session_id] = session
+                resumed_sessions_counter.inc()
+                logger.info(f"Resumed session {session.session_id} for user {user_id}")
+                return session, True
+
+        session = VideoSession(str(uuid.uuid4()), user_id)
+        self._attached[session.session_id] = session
+        return session, False
+
+    def owns(self, session: VideoSession, generation: int) -> bool:
+        return session.generation == generation
+
+    async def detach(self, session: VideoSession, generation: int):
+        if not self.owns(session, generation):
+            return
+
+        self._attached.pop(session.session_id, None)
+
+        if not session.stats.count:
+            return
+
+        if self.grace_period <= 0:
+            await self.finalize(session)
+            return
+
+        try:
+            await asyncio.to_thread(self.store.park, session.to_dict(), time.time() + self.grace_period)
+        except Exception as e:
+            logger.error(f"Error parking session {session.session_id}, finalizing now: {str(e)}")
+            await self.finalize(session)
+
+    async def finish(self, session: VideoSession, generation: int):
+        # Client ended the session on purpose; no reason to wait for it.
+        if not self.owns(session, generation):
+            return None
+
+        self._attached.pop(session.session_id, None)
+        return await self.finalize(session)
+
+    async def finalize(self, session: VideoSession):
+        if not session.stats.count:
+            return None
+
+        # The report reads this session's rows back, so make sure none
+        # are still sitting in the write-behind buffer.
+        await emotion_writer.flush(force=True)
+
+        try:
+            job = await asyncio.to_thread(_save_session_results, session)
+        except Exception as e:
+            logger.error(f"Error finalizing session {session.session_id}: {str(e)}")
+            return None
+
+        if job is not None:
+            job_queue.notify()
+            logger.info(f"Queued report job {job.id} for session {session.session_id}")
+
+        return job
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+
+            try:
+                states = await asyncio.to_thread(self.store.take_expired, time.time())
+            except Exception as e:
+                logger.error(f"Error reaping video sessions: {str(e)}")
+                continue
+
+            for state in states:
+                expired_sessions_counter.inc()
+                await self.finalize(VideoSession.from_dict(state))
+
+def _build_store():
+    if settings.VIDEO_SESSION_STORE == "redis":
+        return RedisSessionStore(redis_client, settings.VIDEO_SESSION_GRACE_PERIOD)
+    if settings.VIDEO_SESSION_STORE == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"Unknown video session store: {settings.VIDEO_SESSION_STORE}")
+
+session_registry = SessionRegistry(
+    store=_build_store(),
+    grace_period=settings.VIDEO_SESSION_GRACE_PERIOD,
+    reap_interval=settings.VIDEO_SESSION_REAP_INTERVAL
+)
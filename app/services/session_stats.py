@@ -0,0 +1,126 @@
+import math
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+import numpy as np
+from app.repositories.emotion_repo import normalize_emotion
+from app.utils.emotion_vector import EMOTION_LABELS, label_probabilities
+
+class EmotionStats:
+    # Welford's online mean/variance, so a session never has to keep or
+    # re-read its individual samples to summarise them.
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / self.count) if self.count > 1 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "EmotionStats":
+        stats = cls()
+        stats.count = data["count"]
+        stats.total = data["total"]
+        stats.mean = data["mean"]
+        stats.m2 = data["m2"]
+        stats.min = data["min"]
+        stats.max = data["max"]
+        return stats
+
+class SessionEmotionAccumulator:
+    def __init__(self):
+        self.stats: Dict[str, EmotionStats] = {}
+        self.period_start: Optional[datetime] = None
+        self.period_end: Optional[datetime] = None
+        self.probability_sum = np.zeros(len(EMOTION_LABELS), dtype=np.float64)
+        self.probability_count = 0
+
+    @property
+    def count(self) -> int:
+        return sum(stats.count for stats in self.stats.values())
+
+    def add(self, emotion: str, intensity: float, timestamp: datetime, probabilities: Optional[Sequence[float]] = None):
+        emotion_type = normalize_emotion(emotion)
+        if emotion_type is None:
+            return
+
+        self.stats.setdefault(emotion_type.value, EmotionStats()).add(float(intensity))
+
+        if probabilities is not None:
+            self.probability_sum += np.asarray(probabilities, dtype=np.float64)
+            self.probability_count += 1
+
+        if self.period_start is None:
+            self.period_start = timestamp
+        self.period_end = timestamp
+
+    def summary(self) -> dict:
+        # Same shape save_emotion_trend builds from the stored rows.
+        return {
+            emotion: {
+                "count": stats.count,
+                "average_confidence": stats.mean,
+                "std_confidence": stats.std,
+                "min_confidence": stats.min,
+                "max_confidence": stats.max,
+            }
+            for emotion, stats in self.stats.items()
+        }
+
+    def average_intensity(self) -> float:
+        if not self.stats:
+            return 0.0
+        return sum(stats.mean for stats in self.stats.values()) / len(self.stats)
+
+    def mean_probabilities(self) -> Optional[dict]:
+        if not self.probability_count:
+            return None
+        return label_probabilities(self.probability_sum / self.probability_count)
+
+    def to_dict(self) -> dict:
+        # JSON-safe snapshot, so a disconnected session can be parked in Redis.
+        return {
+            "stats": {emotion: stats.to_dict() for emotion, stats in self.stats.items()},
+            "period_start": self.period_start.isoformat() if self.period_start else None,
+            "period_end": self.period_end.isoformat() if self.period_end else None,
+            "probability_sum": self.probability_sum.tolist(),
+            "probability_count": self.probability_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SessionEmotionAccumulator":
+        accumulator = cls()
+        accumulator.stats = {
+            emotion: EmotionStats.from_dict(stats) for emotion, stats in data["stats"].items()
+        }
+        if data["period_start"]:
+            accumulator.period_start = datetime.fromisoformat(data["period_start"])
+        if data["period_end"]:
+            accumulator.period_end = datetime.fromisoformat(data["period_end"])
+        accumulator.probability_sum = np.asarray(data["probability_sum"], dtype=np.float64)
+        accumulator.probability_count = data["probability_count"]
+        return accumulator
@@ -0,0 +1,54 @@
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+from app.services import metrics
+
+# Latency of each step of the video pipeline. Every observation goes into a
+# process-wide histogram (exported on /metrics) and into the session's own
+# histograms, which are summarized when the socket closes.
+#   queue     a received frame waiting for the processing loop
+#   decode    JPEG decode and grayscale conversion
+#   detect    face detection and cropping, including the executor wait
+#   classify  emotion model, including batching or the remote round trip
+#   analyze   DeepFace.analyze doing both (non-batched Keras pipeline)
+#   save      handing the samples to the write-behind buffer
+#   send      sending the result to the client
+#   frame     the whole frame, from pickup to result sent
+
+STAGES = ("queue", "decode", "detect", "classify", "analyze", "save", "send", "frame")
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+stage_histograms = {
+    stage: metrics.histogram(
+        f"video_stage_{stage}_seconds", f"Video pipeline latency of the {stage} stage", buckets=STAGE_BUCKETS
+    )
+    for stage in STAGES
+}
+
+class StageTimer:
+    def __init__(self):
+        self.histograms = {stage: metrics.Histogram(stage, "", STAGE_BUCKETS) for stage in STAGES}
+
+    def record(self, stage: str, seconds: float):
+        self.histograms[stage].observe(seconds)
+        stage_histograms[stage].observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def summary(self) -> str:
+        # "decode 2.1/4.0/6.3ms" is p50/p95/p99 for each stage that ran.
+        parts = []
+        for stage, histogram in self.histograms.items():
+            if histogram.count:
+                p50, p95, p99 = (histogram.percentile(q) * 1000 for q in (0.5, 0.95, 0.99))
+                parts.append(f"{stage} {p50:.1f}/{p95:.1f}/{p99:.1f}ms")
+        return ", ".join(parts) or "none"
+
+def timed(timer: Optional[StageTimer], stage: str):
+    return timer.time(stage) if timer is not None else nullcontext()
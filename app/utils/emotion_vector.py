@@ -0,0 +1,25 @@
+import numpy as np
+from typing import Dict, Iterable, Optional, Sequence
+
+# Output order of the DeepFace emotion classifier. Packed probability
+# vectors are stored in this order, so it must never be reshuffled.
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+PROBABILITY_DTYPE = np.dtype("<f2")
+
+def pack_probabilities(probabilities: Sequence[float]) -> bytes:
+    vector = np.asarray(probabilities, dtype=PROBABILITY_DTYPE)
+    if vector.shape != (len(EMOTION_LABELS),):
+        raise ValueError(f"Expected {len(EMOTION_LABELS)} probabilities, got {vector.shape}")
+    return vector.tobytes()
+
+def unpack_probabilities(blobs: Iterable[bytes]) -> np.ndarray:
+    # One frombuffer over all rows instead of decoding them one by one.
+    data = b"".join(blob for blob in blobs if blob)
+    matrix = np.frombuffer(data, dtype=PROBABILITY_DTYPE)
+    return matrix.reshape(-1, len(EMOTION_LABELS)).astype(np.float32)
+
+def label_probabilities(vector: Optional[np.ndarray]) -> Optional[Dict[str, float]]:
+    if vector is None:
+        return None
+    return {label: float(value) for label, value in zip(EMOTION_LABELS, vector)}
@@ -0,0 +1,119 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.face_detectors import DETECTORS, build_detector
+from app.services.face_tracker import box_iou
+
+# Runs every face detector backend over a directory of sample frames and
+# reports throughput, latency percentiles and how often each backend agrees
+# with the reference backend on the main face.
+#
+#   python benchmarks/face_detectors.py --frames samples/ \
+#       --dnn-model res10_300x300_ssd_iter_140000.caffemodel --dnn-config deploy.prototxt \
+#       --yunet-model face_detection_yunet_2023mar.onnx --lbp-model lbpcascade_frontalface_improved.xml
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+def load_frames(directory: str, max_side: int):
+    frames = []
+    for path in sorted(Path(directory).iterdir()):
+        if path.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        scale = max_side / max(image.shape[:2])
+        if scale < 1:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        frames.append((path.name, image, cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)))
+    return frames
+
+def largest(boxes):
+    return max(boxes, key=lambda box: box[2] * box[3]) if boxes else None
+
+def agrees(a, b, iou_threshold: float) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    return box_iou(a, b) >= iou_threshold
+
+def run(detector, frames, repeat: int, color: bool):
+    latencies, results = [], []
+    for _, image, gray in frames:
+        source = image if color else gray
+        for _ in range(repeat):
+            started = time.perf_counter()
+            boxes = detector.detect(source)
+            latencies.append(time.perf_counter() - started)
+        results.append(boxes)
+    return np.array(latencies) * 1000, results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare face detector backends")
+    parser.add_argument("--frames", required=True, help="directory of sample frames")
+    parser.add_argument("--detectors", default=",".join(DETECTORS))
+    parser.add_argument("--reference", default="haar", help="backend the others are compared against")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-side", type=int, default=640, help="downscale frames like the decoder does")
+    parser.add_argument("--color", action="store_true", help="feed BGR instead of the pipeline's grayscale")
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--confidence", type=float, default=0.6)
+    parser.add_argument("--lbp-model")
+    parser.add_argument("--dnn-model")
+    parser.add_argument("--dnn-config")
+    parser.add_argument("--yunet-model")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.max_side)
+    if not frames:
+        sys.exit(f"No images found in {args.frames}")
+
+    model_paths = {
+        "haar": (None, None),
+        "lbp": (args.lbp_model, None),
+        "dnn": (args.dnn_model, args.dnn_config),
+        "yunet": (args.yunet_model, None),
+    }
+
+    results = {}
+    rows = []
+    for name in args.detectors.split(","):
+        model_path, config_path = model_paths[name]
+        try:
+            detector = build_detector(name, model_path, config_path, args.confidence)
+        except (ValueError, IOError, cv2.error) as e:
+            print(f"Skipping {name}: {e}")
+            continue
+
+        # One untimed pass so lazy initialisation is not counted.
+        detector.detect(frames[0][2])
+
+        latencies, boxes = run(detector, frames, args.repeat, args.color)
+        results[name] = boxes
+        rows.append((name, latencies, boxes))
+
+    reference = results.get(args.reference)
+
+    print(f"{len(frames)} frames x {args.repeat} runs, max side {args.max_side}, {'bgr' if args.color else 'gray'} input")
+    print(f"{'detector':<8} {'fps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'faces/frame':>12} {'found':>7} {'agree':>7}")
+    for name, latencies, boxes in rows:
+        found = sum(1 for frame_boxes in boxes if frame_boxes) / len(boxes)
+        faces = sum(len(frame_boxes) for frame_boxes in boxes) / len(boxes)
+        if reference is None:
+            agreement = "-"
+        else:
+            matches = sum(agrees(largest(a), largest(b), args.iou) for a, b in zip(boxes, reference))
+            agreement = f"{matches / len(boxes):.0%}"
+        print(
+            f"{name:<8} {1000 / latencies.mean():>8.1f} "
+            f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f} {np.percentile(latencies, 99):>8.2f} "
+            f"{faces:>12.2f} {found:>7.0%} {agreement:>7}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Measures how long a fresh process takes to import app.main and run the
+# lifespan startup, with and without API_ONLY, and which heavy ML modules
+# end up loaded. Each run is a new interpreter so nothing is cached in
+# sys.modules between runs. Needs the usual .env (database, mail, secrets).
+#
+#   python benchmarks/startup_time.py --runs 5
+#   python benchmarks/startup_time.py --runs 3 --wait-ready   # also time until /ping reports the model loaded
+
+HEAVY_MODULES = ("tensorflow", "keras", "deepface", "prophet", "onnxruntime", "cv2", "pandas")
+
+PROBE = """
+import json, resource, sys, time
+wait_ready, heavy = json.loads(sys.argv[1])
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+result = {"import": imported - started}
+with TestClient(app.main.app) as client:
+    result["startup"] = time.perf_counter() - imported
+    if wait_ready:
+        while client.head("/ping").status_code != 200:
+            time.sleep(0.05)
+        result["ready"] = time.perf_counter() - imported
+
+result["rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+result["modules"] = [name for name in heavy if name in sys.modules]
+print(json.dumps(result))
+"""
+
+def probe(api_only: bool, wait_ready: bool) -> dict:
+    env = dict(os.environ, API_ONLY="true" if api_only else "false")
+    options = json.dumps([wait_ready and not api_only, HEAVY_MODULES])
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, options], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def report(label: str, results: list):
+    print(f"{label}")
+    for key in ("import", "startup", "ready"):
+        values = [result[key] for result in results if key in result]
+        if values:
+            print(f"  {key:<8} median {statistics.median(values) * 1000:8.0f} ms   max {max(values) * 1000:8.0f} ms")
+    print(f"  rss      median {statistics.median(result['rss_mb'] for result in results):8.0f} MiB")
+    print(f"  loaded   {', '.join(results[-1]['modules']) or '-'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare process startup with and without API_ONLY")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--wait-ready", action="store_true", help="in full mode, also wait for the model warmup")
+    args = parser.parse_args()
+
+    for label, api_only in (("API_ONLY=true", True), ("API_ONLY=false", False)):
+        results = [probe(api_only, args.wait_ready) for _ in range(args.runs)]
+        report(label, results)
+
+if __name__ == "__main__":
+    main()
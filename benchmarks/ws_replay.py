@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Replays recorded JPEG sequences against /ws/video/ with N simulated users
+# and reports sustained FPS, per-frame latency and the emotion sample write
+# rate. The app runs inside this process, either behind the in-process
+# TestClient or behind uvicorn on a real loopback socket.
+#
+#   python benchmarks/ws_replay.py --frames recordings/ --users 8 --duration 30 --stub-model
+#   python benchmarks/ws_replay.py --frames recordings/ --users 32 --transport socket --stub-model \
+#       --min-fps 150 --max-p95-ms 250
+#
+# --frames is a directory of .jpg files, or of sub-directories that each
+# hold one recorded sequence; users are spread over the sequences. Each
+# user sends a frame, waits for its result and then waits for the next
+# slot at --fps, like the browser client does.
+#
+# With --smoothing the server only sends emotion changes and heartbeats, so
+# users stream open loop at --fps instead; FPS then counts frames the server
+# processed and there is no per-frame latency.
+#
+# --stub-model serves EMOTION_RUNTIME=stub so nothing is downloaded.
+# Samples go to a scratch SQLite database unless --database-url is given;
+# on a real database the benchmark creates ws-replay-N users.
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg"}
+
+def load_sequences(directory: str) -> List[List[bytes]]:
+    root = Path(directory)
+    folders = sorted(path for path in root.iterdir() if path.is_dir()) or [root]
+
+    sequences = []
+    for folder in folders:
+        frames = [
+            path.read_bytes() for path in sorted(folder.iterdir())
+            if path.suffix.lower() in IMAGE_EXTENSIONS
+        ]
+        if frames:
+            sequences.append(frames)
+    return sequences
+
+class UserStats:
+    def __init__(self):
+        self.sent = 0
+        self.results = 0
+        self.no_face = 0
+        self.errors = 0
+        self.latencies: List[float] = []
+
+    def record(self, message, latency: float) -> bool:
+        # Returns True once the reply to the frame in flight has arrived;
+        # connected/ping/throttle/report_queued messages are skipped.
+        if isinstance(message, (bytes, bytearray)):
+            self.results += 1
+        else:
+            data = json.loads(message)
+            if "status" in data:
+                return False
+            if "error" in data:
+                self.errors += 1
+            elif data.get("emotion") == "no_face":
+                self.no_face += 1
+            else:
+                self.results += 1
+
+        self.latencies.append(latency)
+        return True
+
+def video_path(token: str, args) -> str:
+    return f"/ws/video/?token={token}&protocol={args.protocol}&smoothing={int(args.smoothing)}"
+
+def run_testclient_user(client, token: str, frames: List[bytes], offset: int, args, stats: UserStats):
+    interval = 1.0 / args.fps
+    deadline = time.perf_counter() + args.duration
+
+    with client.websocket_connect(video_path(token, args)) as websocket:
+        websocket.receive_json()
+        index = offset
+        while time.perf_counter() < deadline:
+            slot = time.perf_counter()
+            websocket.send_bytes(frames[index % len(frames)])
+            index += 1
+            stats.sent += 1
+
+            # Replies just queue up in the test client.
+            while not args.smoothing:
+                message = websocket.receive()
+                payload = message.get("bytes") if message.get("bytes") is not None else message.get("text")
+                if payload is None:
+                    raise RuntimeError(f"Server closed the socket: {message}")
+                if stats.record(payload, time.perf_counter() - slot):
+                    break
+
+            time.sleep(max(0.0, slot + interval - time.perf_counter()))
+
+        websocket.close(code=1000)
+
+async def run_socket_user(base_url: str, token: str, frames: List[bytes], offset: int, args, stats: UserStats):
+    import websockets
+
+    interval = 1.0 / args.fps
+    deadline = time.perf_counter() + args.duration
+
+    async with websockets.connect(base_url + video_path(token, args), max_size=None) as websocket:
+        await websocket.recv()
+        # Open loop: keep reading so the server never blocks on a full socket.
+        drain = asyncio.create_task(drain_replies(websocket)) if args.smoothing else None
+        index = offset
+        while time.perf_counter() < deadline:
+            slot = time.perf_counter()
+            await websocket.send(frames[index % len(frames)])
+            index += 1
+            stats.sent += 1
+
+            while drain is None:
+                message = await asyncio.wait_for(websocket.recv(), timeout=args.reply_timeout)
+                if stats.record(message, time.perf_counter() - slot):
+                    break
+
+            await asyncio.sleep(max(0.0, slot + interval - time.perf_counter()))
+
+        if drain is not None:
+            drain.cancel()
+
+async def drain_replies(websocket):
+    async for _ in websocket:
+        pass
+
+def prepare_app(args):
+    # Settings are read at import time, so configure the environment first.
+    if args.stub_model:
+        os.environ["EMOTION_RUNTIME"] = "stub"
+    os.environ["API_ONLY"] = "false"
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    import app.database as database
+
+    scratch = not args.database_url
+    url = args.database_url or f"sqlite:///{tempfile.mkstemp(suffix='.db', prefix='ws_replay_')[1]}"
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args)
+
+    # Swap the engine before app.main pulls in modules that bind
+    # SessionLocal at import.
+    database.engine = engine
+    database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    from app.main import app
+    if scratch:
+        database.Base.metadata.create_all(engine)
+    return app
+
+def create_users(count: int) -> List[str]:
+    from app.database import session_scope
+    from app.models import User
+    from app.utils.jwt import create_access_token
+
+    tokens = []
+    with session_scope() as db:
+        for i in range(count):
+            email = f"ws-replay-{i}@example.invalid"
+            user = db.query(User).filter(User.email == email).first()
+            if user is None:
+                user = User(email=email, username=f"ws-replay-{i}", password_hash="!")
+                db.add(user)
+                db.flush()
+
+            # The socket only accepts the user's current token.
+            user.jwt_token = create_access_token({"user_id": user.id, "role": "user"})
+            tokens.append(user.jwt_token)
+        db.commit()
+    return tokens
+
+def count_samples() -> int:
+    from app.database import session_scope
+    from app.models import EmotionData
+
+    with session_scope() as db:
+        return db.query(EmotionData).count()
+
+def wait_until_ready(timeout: float = 300.0):
+    from app.services.model_registry import model_registry
+
+    deadline = time.perf_counter() + timeout
+    while not model_registry.ready:
+        if time.perf_counter() > deadline:
+            sys.exit("Emotion model did not warm up in time")
+        time.sleep(0.1)
+
+def assignments(sequences, users: int):
+    # Spread users over the sequences and start them at different frames.
+    for i in range(users):
+        frames = sequences[i % len(sequences)]
+        yield frames, (i * 7) % len(frames)
+
+def run_testclient(app, tokens, sequences, args) -> Tuple[List[UserStats], float]:
+    from fastapi.testclient import TestClient
+
+    stats = [UserStats() for _ in tokens]
+    errors = []
+
+    def user(*user_args):
+        try:
+            run_testclient_user(*user_args)
+        except Exception as e:
+            errors.append(e)
+
+    with TestClient(app) as client:
+        wait_until_ready()
+        threads = [
+            threading.Thread(target=user, args=(client, token, frames, offset, args, user_stats))
+            for token, (frames, offset), user_stats in zip(tokens, assignments(sequences, len(tokens)), stats)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    # Leaving the client ran the lifespan shutdown, which flushed the writer.
+
+    for error in errors:
+        print(f"User failed: {error!r}", file=sys.stderr)
+    return stats, elapsed
+
+def run_socket(app, tokens, sequences, args) -> Tuple[List[UserStats], float]:
+    import uvicorn
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", ws_max_size=16 * 1024 * 1024)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    wait_until_ready()
+
+    stats = [UserStats() for _ in tokens]
+
+    async def users():
+        return await asyncio.gather(*[
+            run_socket_user(f"ws://127.0.0.1:{port}", token, frames, offset, args, user_stats)
+            for token, (frames, offset), user_stats in zip(tokens, assignments(sequences, len(tokens)), stats)
+        ], return_exceptions=True)
+
+    started = time.perf_counter()
+    results = asyncio.run(users())
+    elapsed = time.perf_counter() - started
+
+    # Stopping the server runs the lifespan shutdown, which flushes the writer.
+    server.should_exit = True
+    thread.join()
+
+    for error in results:
+        if isinstance(error, Exception):
+            print(f"User failed: {error!r}", file=sys.stderr)
+    return stats, elapsed
+
+def server_counts() -> Tuple[int, int]:
+    from app.services import metrics
+
+    snapshot = metrics.snapshot()
+    frames = snapshot.get("video_stage_frame_seconds", {}).get("count", 0)
+    sent = snapshot.get("video_results_sent_total", {}).get("value", 0)
+    return frames, int(sent)
+
+def stage_summary() -> List[str]:
+    from app.services import metrics
+    from app.services.stage_timer import STAGES
+
+    lines = []
+    snapshot = metrics.snapshot()
+    for stage in STAGES:
+        stage_metrics = snapshot.get(f"video_stage_{stage}_seconds")
+        if stage_metrics and stage_metrics["count"]:
+            lines.append(
+                f"  {stage:<10} {stage_metrics['p50'] * 1000:8.1f} {stage_metrics['p95'] * 1000:8.1f} "
+                f"{stage_metrics['p99'] * 1000:8.1f}"
+            )
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded frames against /ws/video/")
+    parser.add_argument("--frames", required=True, help="directory of JPEGs or of JPEG sequence directories")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds each user streams")
+    parser.add_argument("--fps", type=float, default=10.0, help="frames per second each user tries to send")
+    parser.add_argument("--transport", choices=("testclient", "socket"), default="testclient")
+    parser.add_argument("--protocol", choices=("json", "binary"), default="json")
+    parser.add_argument("--stub-model", action="store_true", help="serve a stand-in emotion model")
+    parser.add_argument("--smoothing", action="store_true", help="only send emotion changes and heartbeats")
+    parser.add_argument("--database-url", help="defaults to a scratch SQLite file")
+    parser.add_argument("--reply-timeout", type=float, default=10.0)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--min-fps", type=float, help="fail if the total sustained FPS is lower")
+    parser.add_argument("--max-p95-ms", type=float, help="fail if the p95 frame latency is higher")
+    args = parser.parse_args()
+
+    sequences = load_sequences(args.frames)
+    if not sequences:
+        sys.exit(f"No JPEG frames found in {args.frames}")
+
+    app = prepare_app(args)
+    tokens = create_users(args.users)
+    samples_before = count_samples()
+
+    run = run_testclient if args.transport == "testclient" else run_socket
+    stats, elapsed = run(app, tokens, sequences, args)
+
+    samples = count_samples() - samples_before
+    latencies = np.array([latency for user in stats for latency in user.latencies]) * 1000
+    server_frames, messages = server_counts()
+    replies = server_frames if args.smoothing else sum(user.results + user.no_face for user in stats)
+    result = {
+        "transport": args.transport,
+        "protocol": args.protocol,
+        "users": args.users,
+        "seconds": elapsed,
+        "frames_sent": sum(user.sent for user in stats),
+        "results": sum(user.results for user in stats),
+        "no_face": sum(user.no_face for user in stats),
+        "errors": sum(user.errors for user in stats),
+        "messages_sent": messages,
+        "fps": replies / elapsed,
+        "fps_per_user": replies / elapsed / args.users,
+        "latency_ms": {
+            name: float(np.percentile(latencies, q)) if len(latencies) else 0.0
+            for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+        "samples_written": samples,
+        "samples_per_second": samples / elapsed,
+    }
+
+    frame_count = sum(len(frames) for frames in sequences)
+    print(
+        f"{args.transport}/{args.protocol}: {args.users} users x {args.duration:.0f}s at {args.fps:.0f} fps, "
+        f"{len(sequences)} sequences ({frame_count} frames)"
+        f"{', stub model' if args.stub_model else ''}{', smoothing' if args.smoothing else ''}"
+    )
+    print(f"frames sent     {result['frames_sent']}")
+    if not args.smoothing:
+        print(f"results         {result['results']} (no face {result['no_face']}, errors {result['errors']})")
+    print(f"messages sent   {messages}")
+    print(f"sustained fps   {result['fps']:.1f} total, {result['fps_per_user']:.2f} per user")
+    latency = result["latency_ms"]
+    if len(latencies):
+        print(f"latency ms      p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  p99 {latency['p99']:.1f}  max {latency['max']:.1f}")
+    print(f"db samples      {samples} ({result['samples_per_second']:.1f} rows/s)")
+
+    stages = stage_summary()
+    if stages:
+        print(f"server stages    {'p50':>8} {'p95':>8} {'p99':>8}  ms")
+        print("\n".join(stages))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failures = []
+    if args.min_fps is not None and result["fps"] < args.min_fps:
+        failures.append(f"sustained fps {result['fps']:.1f} < {args.min_fps}")
+    if args.max_p95_ms is not None and latency["p95"] > args.max_p95_ms:
+        failures.append(f"p95 latency {latency['p95']:.1f} ms > {args.max_p95_ms}")
+    if failures:
+        sys.exit("Regression: " + "; ".join(failures))
+
+if __name__ == "__main__":
+    main()
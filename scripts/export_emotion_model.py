@@ -0,0 +1,153 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Exports the DeepFace emotion classifier to ONNX or TFLite, optionally int8
+# quantized, then checks the exported model against the Keras reference.
+# Needs the full ML stack (tensorflow, deepface) plus tf2onnx for ONNX:
+#
+#   python scripts/export_emotion_model.py --format onnx --output models/emotion.onnx \
+#       --quantize static --calibration-dir samples/faces
+#   python scripts/export_emotion_model.py --format onnx --output models/emotion.onnx --check-only
+#
+# Serve it with EMOTION_RUNTIME=onnx EMOTION_MODEL_PATH=models/emotion.onnx.
+# Calibration and parity images can be face crops or whole frames; frames
+# are run through the same detect/crop/preprocess steps as live video.
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+INPUT_SIZE = 48
+
+def load_faces(directory: str, limit: int) -> np.ndarray:
+    from app.services.face_recognition import detect_faces, largest_box, crop_face
+    from app.services.emotion_model import preprocess_face
+
+    faces = []
+    for path in sorted(Path(directory).iterdir()):
+        if path.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        boxes = detect_faces(None, gray=gray) if min(gray.shape) > 2 * INPUT_SIZE else []
+        face = crop_face(gray, largest_box(boxes)) if boxes else gray
+        faces.append(preprocess_face(face))
+        if len(faces) >= limit:
+            break
+
+    if not faces:
+        sys.exit(f"No images found in {directory}")
+    return np.stack(faces).astype(np.float32)
+
+def synthetic_faces(count: int) -> np.ndarray:
+    # Smoothed noise only exercises the graph; real crops are needed for a
+    # meaningful calibration or parity number.
+    rng = np.random.default_rng(0)
+    faces = rng.random((count, INPUT_SIZE, INPUT_SIZE), dtype=np.float32)
+    return np.stack([cv2.GaussianBlur(face, (7, 7), 0) for face in faces])
+
+def export_onnx(model, output: str, quantize: str, calibration: np.ndarray):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, INPUT_SIZE, INPUT_SIZE, 1), tf.float32, name="face"),)
+    float_path = output if quantize == "none" else output + ".float.onnx"
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=float_path)
+
+    if quantize == "none":
+        return
+
+    from onnxruntime import quantization
+
+    if quantize == "dynamic":
+        quantization.quantize_dynamic(float_path, output, weight_type=quantization.QuantType.QInt8)
+    else:
+        class Calibration(quantization.CalibrationDataReader):
+            def __init__(self):
+                self.batches = iter(calibration[i:i + 1, ..., np.newaxis] for i in range(len(calibration)))
+
+            def get_next(self):
+                batch = next(self.batches, None)
+                return None if batch is None else {"face": batch}
+
+        quantization.quantize_static(
+            float_path, output, Calibration(),
+            activation_type=quantization.QuantType.QInt8,
+            weight_type=quantization.QuantType.QInt8
+        )
+
+    os.remove(float_path)
+
+def export_tflite(model, output: str, quantize: str, calibration: np.ndarray):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize != "none":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == "static":
+        def representative_dataset():
+            for face in calibration:
+                yield [face[np.newaxis, ..., np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    with open(output, "wb") as f:
+        f.write(converter.convert())
+
+def check_parity(reference, candidate, faces: np.ndarray, batch_size: int = 32) -> float:
+    expected = np.concatenate([reference.predict(faces[i:i + batch_size]) for i in range(0, len(faces), batch_size)])
+    actual = np.concatenate([candidate.predict(faces[i:i + batch_size]) for i in range(0, len(faces), batch_size)])
+
+    agreement = float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean())
+    difference = np.abs(expected - actual) * 100
+
+    print(f"Parity on {len(faces)} crops:")
+    print(f"  top-1 agreement       {agreement:.2%}")
+    print(f"  mean |diff|           {difference.mean():.3f} percentage points")
+    print(f"  max |diff|            {difference.max():.3f} percentage points")
+
+    return agreement
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the emotion classifier to an optimized CPU runtime")
+    parser.add_argument("--format", choices=("onnx", "tflite"), default="onnx")
+    parser.add_argument("--output", default="models/emotion.onnx")
+    parser.add_argument("--quantize", choices=("none", "dynamic", "static"), default="none")
+    parser.add_argument("--calibration-dir", help="face crops or frames for int8 calibration and the parity check")
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--min-agreement", type=float, default=0.97)
+    parser.add_argument("--check-only", action="store_true", help="only compare an existing export")
+    args = parser.parse_args()
+
+    from app.services.emotion_runtime import KerasEmotionRuntime, build_runtime
+
+    if args.calibration_dir:
+        faces = load_faces(args.calibration_dir, args.samples)
+    else:
+        print("No --calibration-dir given, using synthetic crops")
+        faces = synthetic_faces(args.samples)
+
+    reference = KerasEmotionRuntime()
+
+    if not args.check_only:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        export = export_onnx if args.format == "onnx" else export_tflite
+        export(reference.model, args.output, args.quantize, faces)
+        print(f"Wrote {args.output} ({os.path.getsize(args.output) / 1024:.0f} KiB)")
+
+    candidate = build_runtime(args.format, args.output)
+    agreement = check_parity(reference, candidate, faces)
+
+    if agreement < args.min_agreement:
+        sys.exit(f"Top-1 agreement {agreement:.2%} is below {args.min_agreement:.2%}")
+
+if __name__ == "__main__":
+    main()